@@ -0,0 +1,80 @@
+import asyncio
+import time
+
+from event_log import EVENTS
+
+
+EVENTS.register_formats({
+    'scan_failed': "[ERROR] Failed to scan {symbol}: {error}",
+})
+
+
+class TokenBucket:
+    """Async token-bucket rate limiter shared by every concurrent request"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate          # tokens added per second
+        self.capacity = capacity  # maximum burst
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    def from_rate_limit(cls, rate_limit_ms, burst=1):
+        """Build a bucket from ccxt's exchange.rateLimit (milliseconds between requests)"""
+        rate = 1000.0 / rate_limit_ms if rate_limit_ms else float('inf')
+        return cls(rate, burst)
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self, tokens=1):
+        """Wait until `tokens` are available and take them"""
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+
+
+def create_async_exchange(exchange):
+    """Create a ccxt.async_support client mirroring an already connected sync exchange"""
+    import ccxt.async_support as ccxt_async
+
+    exchange_class = getattr(ccxt_async, exchange.id)
+    async_exchange = exchange_class({
+        'apiKey': exchange.apiKey,
+        'secret': exchange.secret,
+        'password': exchange.password,
+        'enableRateLimit': False,  # throttled by our shared TokenBucket instead
+        'options': dict(exchange.options),
+    })
+    if exchange.markets:
+        # Reuse the markets the sync client already loaded
+        async_exchange.set_markets(exchange.markets)
+    return async_exchange
+
+
+async def scan_symbols(symbols, worker, concurrency, limiter=None):
+    """Run `await worker(symbol)` for every symbol, at most `concurrency` at a time
+
+    Returns {symbol: result}; a failing symbol maps to None.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(symbol):
+        async with semaphore:
+            if limiter is not None:
+                await limiter.acquire()
+            try:
+                return await worker(symbol)
+            except Exception as e:
+                EVENTS.error('scan_failed', symbol=symbol, error=str(e))
+                return None
+
+    results = await asyncio.gather(*(run(symbol) for symbol in symbols))
+    return dict(zip(symbols, results))
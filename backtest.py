@@ -0,0 +1,234 @@
+"""Offline backtester for the SMA crossover strategy.
+
+Loads historical OHLCV from local CSV/Parquet files (one file per symbol,
+e.g. data/BTC_USDT.csv with timestamp,open,high,low,close,volume columns)
+or from the bot's on-disk candle store (--store candles --exchange binance),
+computes the same signals as analyze_market over whole arrays with NumPy and
+applies the execute_simulated_trade position rules: buy a fixed USD amount
+when flat and the signal is BUY, sell the whole position on SELL.
+
+Each symbol is simulated with its own trade amount, the shared cash limit of
+the live portfolio is not modeled.
+
+Usage:
+    python backtest.py --data data/ --short 3,5,8 --long 20,30,50 --timeframes 1h,4h
+"""
+import argparse
+import csv
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from resampler import _bucket_start
+
+DEFAULT_FEE = 0.001        # Taker fee per side
+DEFAULT_TRADE_AMOUNT = 1.0  # USD per buy, as get_trade_amount_usd() in main.py
+
+
+def load_ohlcv(path):
+    """Load an OHLCV file into a (timestamps, closes) pair of arrays"""
+    if os.path.isdir(path):
+        # candle_store.py column files, memory-mapped
+        timestamps = np.memmap(os.path.join(path, 'timestamp.bin'), dtype=np.int64, mode='r')
+        closes = np.memmap(os.path.join(path, 'close.bin'), dtype=np.float64, mode='r')
+        rows = min(len(timestamps), len(closes))
+        return np.asarray(timestamps[:rows]), np.asarray(closes[:rows])
+    elif path.endswith('.parquet'):
+        import pandas as pd
+
+        frame = pd.read_parquet(path, columns=['timestamp', 'close'])
+        timestamps = frame['timestamp'].to_numpy(dtype=np.int64)
+        closes = frame['close'].to_numpy(dtype=np.float64)
+    else:
+        with open(path) as f:
+            first_line = f.readline()
+        has_header = any(char.isalpha() for char in first_line)
+        data = np.loadtxt(path, delimiter=',', skiprows=1 if has_header else 0, usecols=(0, 4), ndmin=2)
+        timestamps = data[:, 0].astype(np.int64)
+        closes = data[:, 1]
+
+    order = np.argsort(timestamps, kind='stable')
+    return timestamps[order], closes[order]
+
+
+def symbol_from_path(path):
+    """'data/BTC_USDT.csv' or 'candles/binance/BTC_USDT/1h' -> 'BTC/USDT'"""
+    if os.path.isdir(path):
+        path = os.path.dirname(os.path.normpath(path))
+    name = os.path.basename(path).rsplit('.', 1)[0]
+    return name.replace('_', '/').replace('-', '/')
+
+
+def resample_closes(timestamps, closes, timeframe):
+    """Derive higher-timeframe closes (last close of each bucket, buckets aligned as in the live resampler)"""
+    if len(timestamps) == 0:
+        return closes
+    buckets = _bucket_start(timestamps, timeframe)
+    last_in_bucket = np.flatnonzero(np.diff(buckets, append=buckets[-1] + 1))
+    return closes[last_in_bucket]
+
+
+def rolling_mean(values, period):
+    """SMA over the whole array; the first period-1 entries are NaN"""
+    result = np.full(len(values), np.nan)
+    if len(values) >= period:
+        cumsum = np.cumsum(np.insert(values, 0, 0.0))
+        result[period - 1:] = (cumsum[period:] - cumsum[:-period]) / period
+    return result
+
+
+def crossover_signals(short_sma, long_sma):
+    """+1 BUY, -1 SELL, 0 HOLD (or not enough data), like analyze_market"""
+    with np.errstate(invalid='ignore'):
+        signals = np.sign(short_sma - long_sma)
+    return np.nan_to_num(signals).astype(np.int8)
+
+
+def simulate(closes, signals, fee=DEFAULT_FEE, trade_amount=DEFAULT_TRADE_AMOUNT):
+    """Apply the simulated-trade position rules to a signal array
+
+    A BUY opens a position only when flat and a SELL closes the whole
+    position, so holding == "last non-HOLD signal was BUY".
+    """
+    index = np.where(signals != 0, np.arange(len(signals)), 0)
+    np.maximum.accumulate(index, out=index)
+    holding = (signals[index] == 1).astype(np.int8)
+
+    changes = np.diff(holding, prepend=0)
+    entries = np.flatnonzero(changes == 1)
+    exits = np.flatnonzero(changes == -1)
+
+    entry_prices = closes[entries]
+    exit_prices = closes[exits]
+    open_position = len(entries) > len(exits)
+    if open_position:
+        # Mark the open position to the last close
+        exit_prices = np.append(exit_prices, closes[-1])
+
+    amounts = trade_amount * (1 - fee) / entry_prices
+    proceeds = amounts * exit_prices * (1 - fee)
+    pnl = proceeds - trade_amount
+
+    closed_pnl = pnl[:len(exits)]
+    return {
+        'trades': len(entries) + len(exits),
+        'round_trips': len(exits),
+        'realized_pnl': float(closed_pnl.sum()),
+        'unrealized_pnl': float(pnl[-1]) if open_position else 0.0,
+        'win_rate': float((closed_pnl > 0).mean() * 100) if len(exits) else 0.0,
+        'exposure_pct': float(holding.mean() * 100) if len(holding) else 0.0,
+    }
+
+
+def backtest_symbol(path, grid, base_timeframe='1h', fee=DEFAULT_FEE, trade_amount=DEFAULT_TRADE_AMOUNT):
+    """Run every (short, long, timeframe) combination for one symbol file"""
+    symbol = symbol_from_path(path)
+    timestamps, closes = load_ohlcv(path)
+    results = []
+
+    for timeframe, combos in itertools.groupby(sorted(grid, key=lambda c: c[2]), key=lambda c: c[2]):
+        if timeframe == base_timeframe:
+            tf_closes = closes
+        else:
+            tf_closes = resample_closes(timestamps, closes, timeframe)
+
+        smas = {}  # SMAs are shared between combinations using the same period
+        for short_ma, long_ma, _ in combos:
+            for period in (short_ma, long_ma):
+                if period not in smas:
+                    smas[period] = rolling_mean(tf_closes, period)
+            signals = crossover_signals(smas[short_ma], smas[long_ma])
+            stats = simulate(tf_closes, signals, fee, trade_amount)
+            results.append({'symbol': symbol, 'timeframe': timeframe,
+                            'short_ma': short_ma, 'long_ma': long_ma, **stats})
+    return results
+
+
+def build_grid(short_periods, long_periods, timeframes):
+    """All (short, long, timeframe) combinations with short < long"""
+    return [(s, l, tf) for s, l, tf in itertools.product(short_periods, long_periods, timeframes) if s < l]
+
+
+def run_sweep(paths, grid, base_timeframe='1h', fee=DEFAULT_FEE, trade_amount=DEFAULT_TRADE_AMOUNT, workers=None):
+    """Backtest the grid on every file across a process pool, one task per symbol"""
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(backtest_symbol, path, grid, base_timeframe, fee, trade_amount) for path in paths]
+        results = []
+        for path, future in zip(paths, futures):
+            try:
+                results.extend(future.result())
+            except Exception as e:
+                print(f"[ERROR] Backtest failed for {path}: {e}")
+    return results
+
+
+def summarize(results):
+    """Aggregate per-parameter results across symbols, best total P&L first"""
+    totals = {}
+    for row in results:
+        key = (row['short_ma'], row['long_ma'], row['timeframe'])
+        total = totals.setdefault(key, {'short_ma': key[0], 'long_ma': key[1], 'timeframe': key[2],
+                                        'symbols': 0, 'trades': 0, 'pnl': 0.0})
+        total['symbols'] += 1
+        total['trades'] += row['trades']
+        total['pnl'] += row['realized_pnl'] + row['unrealized_pnl']
+    return sorted(totals.values(), key=lambda t: t['pnl'], reverse=True)
+
+
+def parse_int_list(value):
+    return [int(item) for item in value.split(',') if item.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SMA crossover backtester')
+    parser.add_argument('--data', default='data', help='directory with one CSV/Parquet file per symbol')
+    parser.add_argument('--store', default=None, help='read the candle store at this root instead of --data')
+    parser.add_argument('--exchange', default='binance', help='exchange id inside the candle store')
+    parser.add_argument('--short', type=parse_int_list, default=[5], help='short SMA periods, e.g. 3,5,8')
+    parser.add_argument('--long', type=parse_int_list, default=[20], help='long SMA periods, e.g. 20,30,50')
+    parser.add_argument('--timeframes', default='1h', help='timeframes to test, e.g. 1h,4h,1d')
+    parser.add_argument('--base-timeframe', default='1h', help='timeframe of the data files')
+    parser.add_argument('--fee', type=float, default=DEFAULT_FEE)
+    parser.add_argument('--trade-amount', type=float, default=DEFAULT_TRADE_AMOUNT)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--out', default=None, help='write per-symbol results to this CSV file')
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    if args.store:
+        exchange_root = os.path.join(args.store, args.exchange)
+        paths = sorted(os.path.join(exchange_root, name, args.base_timeframe) for name in os.listdir(exchange_root)
+                       if os.path.isdir(os.path.join(exchange_root, name, args.base_timeframe)))
+    else:
+        paths = sorted(os.path.join(args.data, name) for name in os.listdir(args.data)
+                       if name.endswith(('.csv', '.parquet')))
+    if not paths:
+        print(f"[FATAL] No candle data found in {args.store or args.data}")
+        return
+
+    grid = build_grid(args.short, args.long, [tf.strip() for tf in args.timeframes.split(',')])
+    print(f"[INFO] Backtesting {len(paths)} symbols x {len(grid)} parameter sets...")
+
+    started = time.perf_counter()
+    results = run_sweep(paths, grid, args.base_timeframe, args.fee, args.trade_amount, args.workers)
+    elapsed = time.perf_counter() - started
+    print(f"[INFO] {len(results)} backtests in {elapsed:.2f}s")
+
+    if args.out and results:
+        with open(args.out, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(results[0].keys()))
+            writer.writeheader()
+            writer.writerows(results)
+        print(f"[INFO] Results written to {args.out}")
+
+    print(f"\n{'SHORT':>6} {'LONG':>6} {'TF':>4} {'SYMBOLS':>8} {'TRADES':>8} {'P&L':>12}")
+    for total in summarize(results)[:args.top]:
+        print(f"{total['short_ma']:>6} {total['long_ma']:>6} {total['timeframe']:>4} "
+              f"{total['symbols']:>8} {total['trades']:>8} {total['pnl']:>12.4f}")
+
+
+if __name__ == "__main__":
+    main()
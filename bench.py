@@ -0,0 +1,250 @@
+"""Offline benchmark of the trading loop against the deterministic mock exchange.
+
+For each universe size, a fresh process runs main() for a number of cycles
+(dry run, virtual clock so the rate-limit sleeps cost nothing) and then
+times analyze_market() and print_portfolio_summary() on their own. The
+first, cold cycle is left out of the cycle percentiles; p99 needs at
+least 100 measured cycles and is not reported below that. Each size runs
+--repeat times and the median of every metric is compared.
+
+Usage:
+    python bench.py                       # compare with bench_baseline.json
+    python bench.py --update-baseline     # record a new baseline
+    python bench.py --sizes 10 100 --cycles 20 --repeat 1 --latency 0.001
+
+Exits with status 1 if a metric regressed by more than --tolerance.
+Baseline numbers depend on the machine, re-record them when it changes.
+"""
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import time
+
+BASELINE_FILE = 'bench_baseline.json'
+DEFAULT_SIZES = (10, 100, 1000)
+VIRTUAL_START = 1_700_000_000.0  # fixed start so every run sees the same candles
+MIN_TIME_DELTA = 0.01  # seconds, smaller slowdowns are timer noise and never count as regressions
+P99_MIN_CYCLES = 100  # measured cycles needed before p99 is more than the slowest cycle
+
+# metric -> True if higher is better
+METRICS_DIRECTION = {
+    'cycle_p50_seconds': False,
+    'cycle_p99_seconds': False,
+    'analyze_symbols_per_second': True,
+    'summary_seconds': False,
+    'summary_requests': False,
+    'peak_rss_mb': False,
+}
+
+
+def percentile(values, q):
+    """Nearest-rank percentile"""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def configure_bot(main, exchange, workdir, cycles):
+    """Point main at the mock exchange with fresh, disk-free state"""
+    from candle_cache import CandleCache
+    from fx_rates import FxRateProvider
+    from portfolio_ledger import PortfolioLedger
+    from price_snapshot import PriceSnapshot
+    from signal_state import SignalStateMachine
+    from sma_engine import RollingSMA
+
+    main.DRY_RUN = True
+    main.MAX_CYCLES = cycles
+    main.METRICS_PORT = None
+    main.METRICS_CYCLE_LOG = os.path.join(workdir, 'cycles.jsonl')
+    main.MARKETS_CACHE_DIR = os.path.join(workdir, 'markets')
+    main.ASYNC_SCAN = main.STREAMING_MODE = main.ALIGN_TO_CANDLES = False
+    main.SHARD_COUNT = 0
+    main.MIN_QUOTE_VOLUME_USD, main.MAX_SPREAD_PCT, main.MAX_SYMBOLS = 0, None, None
+
+    main.candle_cache = CandleCache(main.TIMEFRAME, main.OHLCV_CACHE_SIZE)
+    main.sma_engine = RollingSMA([main.SHORT_MA, main.LONG_MA])
+    main.price_snapshot = PriceSnapshot()
+    main.signal_state = SignalStateMachine(None, threshold_pct=main.SIGNAL_THRESHOLD_PCT)
+    main.fx_rates = FxRateProvider(ttl=float('inf'), cache_file=None)
+    main.fx_rates.rate, main.fx_rates.fetched_at = 5.0, VIRTUAL_START
+    main.ledger = PortfolioLedger(None)
+    main.event_log.path = None  # console only, and the console is discarded
+    main.initialize_exchange = lambda: exchange
+
+
+def run_size(size, cycles, latency, error_rate):
+    """Benchmark one universe size, meant to run in its own process"""
+    import candle_cache
+    import fx_rates
+    import main
+    import mock_exchange
+    from mock_exchange import MockExchange
+    from portfolio_ledger import PortfolioLedger
+    from virtual_clock import VirtualClock, install
+
+    clock = VirtualClock(VIRTUAL_START)
+    install(clock, [main, candle_cache, fx_rates, mock_exchange])
+    exchange = MockExchange(symbol_count=size, latency=latency, error_rate=error_rate)
+
+    with tempfile.TemporaryDirectory() as workdir, open(os.devnull, 'w') as devnull:
+        configure_bot(main, exchange, workdir, cycles)
+
+        with contextlib.redirect_stdout(devnull):
+            main.main()
+            symbols = list(exchange.symbols)
+
+            # analyze_market on its own: warm cache, one delta fetch per symbol, best of 5 passes
+            analyze_seconds = float('inf')
+            for _ in range(5):
+                clock.sleep(3600)
+                started = time.perf_counter()
+                for symbol in symbols:
+                    main.analyze_market(exchange, symbol)
+                analyze_seconds = min(analyze_seconds, time.perf_counter() - started)
+
+            # Portfolio summary holding every symbol
+            main.ledger = PortfolioLedger(None)
+            main.ledger.open(float(len(symbols)))
+            for symbol in symbols:
+                main.ledger.buy(symbol.split('/')[0], 1.0, 1.0)
+            summary_times, summary_requests = [], []
+            for _ in range(10):
+                main.price_snapshot.begin_cycle()
+                calls_before = sum(exchange.calls.values())
+                started = time.perf_counter()
+                main.print_portfolio_summary(exchange, 0)
+                summary_times.append(time.perf_counter() - started)
+                summary_requests.append(sum(exchange.calls.values()) - calls_before)
+
+        with open(main.METRICS_CYCLE_LOG) as f:
+            durations = [json.loads(line)['duration'] for line in f][1:]  # the first cycle loads everything
+
+    return {
+        'cycles': len(durations),
+        'cycle_p50_seconds': percentile(durations, 50),
+        'cycle_p99_seconds': percentile(durations, 99) if len(durations) >= P99_MIN_CYCLES else None,
+        'analyze_symbols_per_second': len(symbols) / analyze_seconds if analyze_seconds else 0.0,
+        'summary_seconds': min(summary_times),
+        'summary_requests': max(summary_requests),
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,  # KiB on Linux
+        'requests': dict(sorted(exchange.calls.items())),
+    }
+
+
+def run_isolated(size, cycles, latency, error_rate):
+    """run_size() in a spawned process so peak RSS and module state are per size"""
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(1) as pool:
+        return pool.apply(run_size, (size, cycles, latency, error_rate))
+
+
+def median_result(runs):
+    """Median of every metric over repeated runs of one size"""
+    result = dict(runs[0])
+    for metric in METRICS_DIRECTION:
+        values = [run[metric] for run in runs if run[metric] is not None]
+        result[metric] = statistics.median(values) if values else None
+    result['runs'] = len(runs)
+    return result
+
+
+def compare(results, baseline, tolerance):
+    """Return a list of regression messages against the baseline"""
+    regressions = []
+    for size, result in results.items():
+        reference = baseline.get(size)
+        if reference is None:
+            continue
+        for metric, higher_is_better in METRICS_DIRECTION.items():
+            old, new = reference.get(metric), result[metric]
+            if not old or new is None:
+                continue
+            if metric == 'summary_requests':
+                regressed = new > old  # request counts are exact
+            elif higher_is_better:
+                # compared as time per pass so the noise floor applies too
+                regressed = new < old / (1 + tolerance) and int(size) / new - int(size) / old > MIN_TIME_DELTA
+            elif metric.endswith('_seconds'):
+                regressed = new > old * (1 + tolerance) and new - old > MIN_TIME_DELTA
+            else:
+                regressed = new > old * (1 + tolerance)
+            if regressed:
+                regressions.append(f"{size} symbols: {metric} {old:.4g} -> {new:.4g}")
+    return regressions
+
+
+def format_seconds(value):
+    return f"{value:>9.4f}" if value is not None else f"{'-':>9}"
+
+
+def print_results(results, baseline):
+    print(f"{'symbols':>8} {'cycles':>6} {'p50 (s)':>9} {'p99 (s)':>9} {'analyze/s':>10} "
+          f"{'summary (s)':>11} {'sum. req':>8} {'RSS (MB)':>9}")
+    for size, r in results.items():
+        print(f"{size:>8} {r['cycles']:>6} {format_seconds(r['cycle_p50_seconds'])} "
+              f"{format_seconds(r['cycle_p99_seconds'])} "
+              f"{r['analyze_symbols_per_second']:>10.0f} {r['summary_seconds']:>11.4f} "
+              f"{r['summary_requests']:>8} {r['peak_rss_mb']:>9.1f}")
+        reference = baseline.get(size)
+        if reference:
+            print(f"{'baseline':>8} {reference['cycles']:>6} {format_seconds(reference['cycle_p50_seconds'])} "
+                  f"{format_seconds(reference.get('cycle_p99_seconds'))} "
+                  f"{reference['analyze_symbols_per_second']:>10.0f} "
+                  f"{reference['summary_seconds']:>11.4f} {reference['summary_requests']:>8} "
+                  f"{reference['peak_rss_mb']:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the bot against a mock exchange')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES))
+    parser.add_argument('--cycles', type=int, default=P99_MIN_CYCLES + 1, help='cycles per run, the first is not measured')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per size, metrics are their median')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every mock request')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of mock requests failing')
+    parser.add_argument('--tolerance', type=float, default=0.5, help='allowed relative slowdown (0.5 = 50%%)')
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--update-baseline', action='store_true')
+    args = parser.parse_args()
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results = {}
+    for size in args.sizes:
+        print(f"[INFO] Benchmarking {size} symbols ({args.cycles} cycles, {args.repeat} runs)...")
+        runs = [run_isolated(size, args.cycles, args.latency, args.error_rate) for _ in range(args.repeat)]
+        results[str(size)] = median_result(runs)
+
+    print_results(results, baseline)
+
+    if args.update_baseline:
+        baseline.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"[INFO] Baseline written to {args.baseline}")
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance)
+    for message in regressions:
+        print(f"[ERROR] Regression: {message}")
+    if not baseline:
+        print(f"[WARNING] No baseline in {args.baseline}, run with --update-baseline")
+    elif not regressions:
+        print("[INFO] No regressions")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
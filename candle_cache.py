@@ -0,0 +1,225 @@
+import time
+
+from event_log import EVENTS
+
+EVENTS.register_formats({
+    'candle_read_failed': "[WARNING] Failed to read stored candles for {symbol}: {error}",
+    'candle_store_failed': "[WARNING] Failed to store candles for {symbol}: {error}",
+    'candle_gap': "[WARNING] Gap in cached candles for {symbol}, refetching history",
+    'candle_confirm_failed': "[WARNING] Trading venue did not resend candles for {symbol}: {error}",
+})
+
+
+TIMEFRAME_UNITS_MS = {
+    'm': 60 * 1000,
+    'h': 60 * 60 * 1000,
+    'd': 24 * 60 * 60 * 1000,
+    'w': 7 * 24 * 60 * 60 * 1000,
+    'M': 30 * 24 * 60 * 60 * 1000,
+}
+
+def timeframe_to_ms(timeframe):
+    """Convert a ccxt timeframe string ('1m', '1h', '1d', ...) to milliseconds"""
+    amount, unit = timeframe[:-1], timeframe[-1]
+    if unit not in TIMEFRAME_UNITS_MS or not amount.isdigit():
+        raise ValueError(f"Unsupported timeframe: {timeframe}")
+    return int(amount) * TIMEFRAME_UNITS_MS[unit]
+
+
+class CandleCache:
+    """Per-symbol OHLCV cache that only asks the exchange for new candles"""
+
+    def __init__(self, timeframe, max_candles, store=None, max_delta=None):
+        self.timeframe = timeframe
+        self.timeframe_ms = timeframe_to_ms(timeframe)
+        self.max_candles = max_candles  # closed candles kept, plus the forming one
+        self.max_delta = max_delta or max_candles  # largest catch-up fetched with since=
+        self.store = store  # optional CandleStore for warm starts and history on disk
+        self.candles = {}  # {symbol: [[timestamp, open, high, low, close, volume], ...]}
+        self.unconfirmed = {}  # {symbol: oldest cached timestamp sent by another venue, not stored yet}
+        self.confirming = {}   # {symbol: future of the trading venue's copy of the unconfirmed candles}
+        self.replaced = set()  # symbols whose older candles were replaced, see take_replaced()
+        self.full_fetches = 0
+        self.delta_fetches = 0
+
+    def _merge(self, cached, new_candles):
+        """Merge new candles into the cached list, newer data wins on equal timestamps"""
+        by_timestamp = {candle[0]: candle for candle in cached}
+        for candle in new_candles:
+            by_timestamp[candle[0]] = list(candle)
+        return [by_timestamp[ts] for ts in sorted(by_timestamp)]
+
+    def _warm_start(self, exchange_id, symbol):
+        """Load the newest stored candles so a restart only has to fetch the tail"""
+        if self.store is None or self.candles.get(symbol):
+            return
+        try:
+            stored = self.store.read_tail(exchange_id, symbol, self.timeframe, self.max_candles + 1)
+            if stored:
+                self.candles[symbol] = stored
+        except Exception as e:
+            EVENTS.warning('candle_read_failed', symbol=symbol, error=str(e))
+
+    def _track_venue(self, exchange, symbol, full, ohlcv):
+        """Note candles answered by a backup venue of a hedged client (exchange.answered_by),
+        they are only stored once exchange.id has sent the same candles"""
+        venue = getattr(exchange, 'answered_by', {}).get(symbol, exchange.id)
+        if venue != exchange.id:
+            if ohlcv:
+                self.unconfirmed[symbol] = min(ohlcv[0][0], self.unconfirmed.get(symbol, ohlcv[0][0]))
+        elif symbol in self.unconfirmed and (full or (ohlcv and ohlcv[0][0] <= self.unconfirmed[symbol])):
+            del self.unconfirmed[symbol]
+
+    def _confirm(self, exchange, symbol):
+        """Have the trading venue resend the closed candles another venue answered with, in the
+        background (exchange.fetch_primary_ohlcv), and merge its copy on a later call"""
+        future = self.confirming.get(symbol)
+        if future is not None:
+            if not future.done():
+                return
+            del self.confirming[symbol]
+            try:
+                self._merge_confirmed(symbol, future.result())
+            except Exception as e:
+                EVENTS.warning('candle_confirm_failed', symbol=symbol, error=str(e))
+
+        first = self.unconfirmed.get(symbol)
+        window = self.candles[symbol][-(self.max_candles + 1):]
+        if first is None or first >= window[-1][0]:
+            return  # at most the forming candle came from another venue, it is not stored anyway
+        # Candles that left the cache can't be stored anymore, so the request stays bounded
+        first = self.unconfirmed[symbol] = max(first, window[0][0])
+        limit = sum(1 for candle in window if candle[0] >= first)
+        future = exchange.fetch_primary_ohlcv(symbol, timeframe=self.timeframe, since=first, limit=limit)
+        if future is not None:
+            self.confirming[symbol] = future
+
+    def _merge_confirmed(self, symbol, ohlcv):
+        """Replace the unconfirmed closed candles with the trading venue's copy"""
+        first = self.unconfirmed.get(symbol)
+        cached = self.candles[symbol]
+        if first is None:
+            return  # the trading venue answered a regular fetch in the meantime
+        if not ohlcv or ohlcv[0][0] > first:
+            raise ValueError(f"expected candles from {first}, got {ohlcv[0][0] if ohlcv else 'none'}")
+
+        closed = [candle for candle in ohlcv if candle[0] < cached[-1][0]]
+        if not closed:
+            return
+        self.candles[symbol] = cached = self._merge(cached, closed)
+        self.replaced.add(symbol)
+        pending = [candle[0] for candle in cached[:-1] if candle[0] > closed[-1][0]]
+        if pending:
+            self.unconfirmed[symbol] = pending[0]
+        else:
+            del self.unconfirmed[symbol]
+
+    def _finish(self, exchange_id, symbol):
+        """Persist newly closed candles (all but the forming one), then trim to max_candles"""
+        candles = self.candles[symbol]
+        closed = candles[:-1]
+        if symbol in self.unconfirmed:
+            closed = [candle for candle in closed if candle[0] < self.unconfirmed[symbol]]
+        if self.store is not None and closed:
+            try:
+                self.store.append(exchange_id, symbol, self.timeframe, closed)
+            except Exception as e:
+                EVENTS.warning('candle_store_failed', symbol=symbol, error=str(e))
+
+        if len(candles) > self.max_candles + 1:
+            self.candles[symbol] = candles = candles[-(self.max_candles + 1):]
+        return candles
+
+    def _request_params(self, symbol):
+        """Return (since, limit) for the next fetch; since=None means a full fetch"""
+        cached = self.candles.get(symbol)
+
+        if not cached:
+            # Cold cache (first run or restart)
+            return None, self.max_candles + 1
+
+        last_ts = cached[-1][0]
+        now_ms = int(time.time() * 1000)
+        missing = (now_ms - last_ts) // self.timeframe_ms + 1
+
+        if missing > self.max_delta:
+            # Too far behind for a delta to be worth it
+            return None, self.max_candles + 1
+
+        return last_ts, missing + 1
+
+    def _store(self, symbol, since, ohlcv):
+        """Store fetched candles, returns None if a full refetch is needed"""
+        if since is None:
+            self.full_fetches += 1
+            self.candles[symbol] = [list(candle) for candle in ohlcv]
+            self.replaced.add(symbol)
+            return self.candles[symbol]
+
+        self.delta_fetches += 1
+        cached = self.candles[symbol]
+
+        if not ohlcv:
+            return cached
+
+        if ohlcv[0][0] > since:
+            # The exchange skipped candles we expected, so the cache has a gap
+            EVENTS.warning('candle_gap', symbol=symbol)
+            return None
+
+        self.candles[symbol] = self._merge(cached, ohlcv)
+        return self.candles[symbol]
+
+    def get(self, exchange, symbol):
+        """Return cached candles for symbol, fetching only the delta since the last cached candle"""
+        self._warm_start(exchange.id, symbol)
+        since, limit = self._request_params(symbol)
+        ohlcv = exchange.fetch_ohlcv(symbol, timeframe=self.timeframe, since=since, limit=limit)
+        if self._store(symbol, since, ohlcv) is None:
+            ohlcv = exchange.fetch_ohlcv(symbol, timeframe=self.timeframe, limit=self.max_candles + 1)
+            self._store(symbol, None, ohlcv)
+            since = None
+        self._track_venue(exchange, symbol, since is None, ohlcv)
+        if symbol in self.unconfirmed or symbol in self.confirming:
+            self._confirm(exchange, symbol)
+        return self._finish(exchange.id, symbol)
+
+    async def get_async(self, exchange, symbol):
+        """Same as get() for a ccxt.async_support exchange"""
+        self._warm_start(exchange.id, symbol)
+        since, limit = self._request_params(symbol)
+        ohlcv = await exchange.fetch_ohlcv(symbol, timeframe=self.timeframe, since=since, limit=limit)
+        if self._store(symbol, since, ohlcv) is None:
+            ohlcv = await exchange.fetch_ohlcv(symbol, timeframe=self.timeframe, limit=self.max_candles + 1)
+            self._store(symbol, None, ohlcv)
+        return self._finish(exchange.id, symbol)
+
+    def apply(self, symbol, candle, exchange_id=None):
+        """Merge a single candle pushed by a stream, returns the updated candle list"""
+        cached = self.candles.setdefault(symbol, [])
+        candle = list(candle)
+
+        if not cached or candle[0] > cached[-1][0]:
+            cached.append(candle)
+            if self.store is not None and exchange_id and len(cached) > 1:
+                # The previous candle just closed
+                try:
+                    self.store.append(exchange_id, symbol, self.timeframe, cached[-2:-1])
+                except Exception as e:
+                    EVENTS.warning('candle_store_failed', symbol=symbol, error=str(e))
+            if len(cached) > self.max_candles + 1:
+                del cached[0]
+        elif candle[0] == cached[-1][0]:
+            cached[-1] = candle
+        else:
+            self.candles[symbol] = self._merge(cached, [candle])[-(self.max_candles + 1):]
+            self.replaced.add(symbol)
+        return self.candles[symbol]
+
+    def take_replaced(self, symbol):
+        """True once after symbol's history was refetched or rewritten, so consumers
+        that skip already seen timestamps (RollingSMA, ...) know to reset it"""
+        if symbol not in self.replaced:
+            return False
+        self.replaced.discard(symbol)
+        return True
@@ -0,0 +1,114 @@
+"""Append-only columnar candle store.
+
+Layout: {root}/{exchange}/{BASE_QUOTE}/{timeframe}/{column}.bin, one file per
+OHLCV column. Timestamps are int64, prices and volume float64, native byte
+order. Only closed candles are stored and rows are only ever appended, so the
+files can be read offline without this module, e.g. with NumPy:
+
+    closes = np.memmap('candles/binance/BTC_USDT/1h/close.bin', dtype=np.float64, mode='r')
+"""
+import mmap
+import os
+from array import array
+
+COLUMNS = ('timestamp', 'open', 'high', 'low', 'close', 'volume')
+TYPECODES = {'timestamp': 'q', 'open': 'd', 'high': 'd', 'low': 'd', 'close': 'd', 'volume': 'd'}
+ROW_BYTES = 8  # every column is 8 bytes wide
+
+
+def symbol_to_dirname(symbol):
+    """'BTC/USDT' -> 'BTC_USDT' (':' of derivative symbols becomes '-')"""
+    return symbol.replace('/', '_').replace(':', '-')
+
+
+class CandleStore:
+    """On-disk candle history keyed by (exchange, symbol, timeframe)"""
+
+    def __init__(self, root):
+        self.root = root
+        self.last_ts = {}  # {(exchange, symbol, timeframe): last stored timestamp}
+
+    def path(self, exchange_id, symbol, timeframe):
+        return os.path.join(self.root, exchange_id, symbol_to_dirname(symbol), timeframe)
+
+    def _column_files(self, directory):
+        return {column: os.path.join(directory, f"{column}.bin") for column in COLUMNS}
+
+    def _row_count(self, files):
+        """Rows present in every column; a torn append leaves some columns longer"""
+        sizes = [os.path.getsize(path) if os.path.exists(path) else 0 for path in files.values()]
+        return min(sizes) // ROW_BYTES
+
+    def _repair(self, files, rows):
+        """Cut columns back to the same length after an interrupted append"""
+        for path in files.values():
+            if os.path.exists(path) and os.path.getsize(path) > rows * ROW_BYTES:
+                with open(path, 'r+b') as f:
+                    f.truncate(rows * ROW_BYTES)
+
+    def _map_column(self, path, typecode):
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return mapped, memoryview(mapped).cast(typecode)
+
+    def read_tail(self, exchange_id, symbol, timeframe, count):
+        """Return the last `count` stored candles as [[timestamp, o, h, l, c, v], ...]"""
+        files = self._column_files(self.path(exchange_id, symbol, timeframe))
+        rows = self._row_count(files)
+        if rows == 0:
+            return []
+
+        start = max(0, rows - count)
+        columns = []
+        for column in COLUMNS:
+            mapped, view = self._map_column(files[column], TYPECODES[column])
+            try:
+                columns.append(view[start:rows].tolist())
+            finally:
+                view.release()
+                mapped.close()
+
+        candles = [list(row) for row in zip(*columns)]
+        self.last_ts[(exchange_id, symbol, timeframe)] = candles[-1][0]
+        return candles
+
+    def read(self, exchange_id, symbol, timeframe):
+        """Return {column: memoryview} over the whole history, memory-mapped (caller releases)"""
+        files = self._column_files(self.path(exchange_id, symbol, timeframe))
+        rows = self._row_count(files)
+        if rows == 0:
+            return {column: memoryview(array(TYPECODES[column])) for column in COLUMNS}
+        return {column: self._map_column(files[column], TYPECODES[column])[1][:rows] for column in COLUMNS}
+
+    def last_timestamp(self, exchange_id, symbol, timeframe):
+        """Timestamp of the newest stored candle, or None"""
+        key = (exchange_id, symbol, timeframe)
+        if key not in self.last_ts:
+            tail = self.read_tail(exchange_id, symbol, timeframe, 1)
+            self.last_ts[key] = tail[-1][0] if tail else None
+        return self.last_ts[key]
+
+    def append(self, exchange_id, symbol, timeframe, candles):
+        """Append closed candles newer than what is already stored, returns rows written"""
+        last_ts = self.last_timestamp(exchange_id, symbol, timeframe)
+        new_candles = [candle for candle in candles if last_ts is None or candle[0] > last_ts]
+        if not new_candles:
+            return 0
+
+        directory = self.path(exchange_id, symbol, timeframe)
+        os.makedirs(directory, exist_ok=True)
+        files = self._column_files(directory)
+        self._repair(files, self._row_count(files))
+
+        columns = {'timestamp': array('q', (int(candle[0]) for candle in new_candles))}
+        for index, column in enumerate(COLUMNS[1:], 1):
+            # Some exchanges report missing volume/prices as None
+            columns[column] = array('d', (float('nan') if candle[index] is None else candle[index]
+                                          for candle in new_candles))
+
+        for column in COLUMNS:
+            with open(files[column], 'ab') as f:
+                f.write(columns[column].tobytes())
+
+        self.last_ts[(exchange_id, symbol, timeframe)] = new_candles[-1][0]
+        return len(new_candles)
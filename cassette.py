@@ -0,0 +1,252 @@
+"""Record every exchange and FX response of a session, and replay it offline.
+
+A cassette is a gzipped JSON-lines file. Each line is one event: the
+exchange identity, the loaded markets, the starting FX, signal and portfolio state,
+a cycle marker, or one API call with its arguments and its result or
+error. On replay, calls are answered from the cassette and a virtual clock
+jumps to each recorded cycle start, so sleeps in the bot cost nothing.
+"""
+import gzip
+import json
+import sys
+import threading
+import time
+from collections import deque
+
+import ccxt
+
+from event_log import EVENTS
+from virtual_clock import VirtualClock, install
+
+EVENTS.register_formats({
+    'cassette_truncated': "[WARNING] Cassette {path} is truncated, replaying what was recorded",
+    'replay_finished': "[INFO] Replay finished: {misses} missing responses, {unused} recorded calls unused",
+})
+
+# Exchange methods captured by the recorder
+RECORDED_METHODS = (
+    'load_markets', 'fetch_ohlcv', 'fetch_ticker', 'fetch_tickers', 'fetch_balance',
+    'create_order', 'fetch_order', 'fetch_orders', 'fetch_open_orders', 'fetch_closed_orders',
+)
+MARKET_FIELDS = ('id', 'symbol', 'base', 'quote', 'active', 'type', 'spot')
+
+
+def _call_key(method, args, kwargs):
+    return json.dumps([method, list(args), kwargs], sort_keys=True, default=str)
+
+
+def _compact(value):
+    """Drop ccxt's raw 'info' payloads, the bot never reads them"""
+    if isinstance(value, dict):
+        return {key: _compact(item) for key, item in value.items() if key != 'info'}
+    if isinstance(value, (list, tuple)):
+        return [_compact(item) for item in value]
+    return value
+
+
+class CassetteRecorder:
+    """Appends every wrapped call to a cassette file"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = gzip.open(path, 'wt', encoding='utf-8')
+        self._lock = threading.Lock()
+
+    def write(self, event):
+        line = json.dumps(event, separators=(',', ':'), default=str)
+        with self._lock:
+            self._file.write(line + '\n')
+
+    def wrap(self, method, func):
+        """Return func recording its arguments and result (or error) under method"""
+        def wrapper(*args, **kwargs):
+            event = {'type': 'call', 't': time.time(), 'm': method, 'k': _call_key(method, args, kwargs)}
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                event['e'] = [type(e).__name__, str(e)]
+                self.write(event)
+                raise
+            event['r'] = _compact(result)
+            self.write(event)
+            return result
+        return wrapper
+
+    def record_exchange(self, exchange, methods=RECORDED_METHODS):
+        """Wrap the exchange's API methods in place"""
+        self.write({'type': 'exchange', 't': time.time(), 'id': exchange.id, 'rateLimit': exchange.rateLimit})
+        for method in methods:
+            if getattr(exchange, method, None) is not None:
+                setattr(exchange, method, self.wrap(method, getattr(exchange, method)))
+        return exchange
+
+    def record_markets(self, exchange):
+        """Save the loaded markets (only the fields the bot uses)"""
+        markets = {
+            symbol: {field: market.get(field) for field in MARKET_FIELDS}
+            for symbol, market in (exchange.markets or {}).items()
+        }
+        self.write({'type': 'markets', 'markets': markets})
+
+    def record_state(self, fx_rates, signal_state, ledger):
+        """Save the state the session starts from, and capture FX fetches from now on"""
+        self.write({'type': 'state', 't': time.time(), 'fx_rate': fx_rates.rate,
+                    'fx_fetched_at': fx_rates.fetched_at, 'signal_states': dict(signal_state.states),
+                    'portfolio': ledger.state()})
+        fx_rates._fetch = self.wrap('fx_rate', fx_rates._fetch)
+
+    def mark_cycle(self, cycle):
+        self.write({'type': 'cycle', 't': time.time(), 'cycle': cycle})
+        with self._lock:
+            self._file.flush()  # a crashed session still leaves every finished cycle readable
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class ReplayExchange:
+    """ccxt look-alike answering from a cassette"""
+
+    def __init__(self, player, exchange_id, rate_limit, markets):
+        self.id = exchange_id
+        self.rateLimit = rate_limit
+        self.markets = markets
+        self.options = {}
+        self.has = {}
+        self.apiKey = self.secret = self.password = None
+        for method in RECORDED_METHODS:
+            setattr(self, method, lambda *args, _method=method, **kwargs: player.replay(_method, args, kwargs))
+
+    def set_markets(self, markets, currencies=None):
+        self.markets = markets
+        return markets
+
+    def market(self, symbol):
+        return self.markets[symbol]
+
+    def close(self):
+        pass
+
+
+class CassettePlayer:
+    """Serves recorded responses in order and drives a virtual clock"""
+
+    def __init__(self, path):
+        self.path = path
+        self.calls = {}    # {call key: deque of events}
+        self.targets = {}  # {(method, first argument): deque of events}, fallback when arguments differ
+        self.cycles = {}   # {cycle: timestamp}
+        self.state = {}
+        self.exchange_info = {'id': 'replay', 'rateLimit': 0}
+        self.markets = {}
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        start = None
+        for event in self._read(path):
+            start = start if start is not None or 't' not in event else event['t']
+            kind = event['type']
+            if kind == 'call':
+                event['used'] = False
+                self.calls.setdefault(event['k'], deque()).append(event)
+                self.targets.setdefault(self._target(event['k']), deque()).append(event)
+            elif kind == 'cycle':
+                self.cycles[event['cycle']] = event['t']
+            elif kind == 'state':
+                self.state = event
+            elif kind == 'exchange':
+                self.exchange_info = event
+            elif kind == 'markets':
+                self.markets = event['markets']
+
+        self.clock = VirtualClock(start if start is not None else 0.0)
+        self.exchange = ReplayExchange(self, self.exchange_info['id'], self.exchange_info['rateLimit'], self.markets)
+
+    @staticmethod
+    def _read(path):
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    yield json.loads(line)
+        except (EOFError, json.JSONDecodeError):
+            EVENTS.warning('cassette_truncated', path=path)
+
+    @staticmethod
+    def _target(key):
+        method, args, _ = json.loads(key)
+        return method, json.dumps(args[:1], default=str)
+
+    @staticmethod
+    def _pop(events):
+        while events:
+            event = events.popleft()
+            if not event['used']:
+                event['used'] = True
+                return event
+        return None
+
+    def replay(self, method, args, kwargs):
+        """Answer one call; arguments that drifted (e.g. a since= computed a second later) fall back
+        to the next recorded call of the same method for the same symbol"""
+        key = _call_key(method, args, kwargs)
+        with self._lock:
+            event = self._pop(self.calls.get(key, deque())) or self._pop(self.targets.get(self._target(key), deque()))
+            if event is None:
+                self.misses += 1
+                raise ccxt.ExchangeError(f"cassette has no recorded response for {method}{tuple(args)}")
+
+        if 'e' in event:
+            name, message = event['e']
+            error_class = getattr(ccxt, name, None)
+            if not (isinstance(error_class, type) and issubclass(error_class, Exception)):
+                error_class = ccxt.ExchangeError
+            raise error_class(message)
+        return event['r']
+
+    def restore_state(self, fx_rates, signal_state, ledger):
+        """Start from the recorded FX, signal and portfolio state; FX refreshes are answered from the cassette"""
+        fx_rates.rate = self.state.get('fx_rate')
+        fx_rates.fetched_at = self.state.get('fx_fetched_at', 0.0)
+
+        def fetch_rate():
+            # A miss fails like a live fetch (None), so the provider's fallback and backoff take over
+            try:
+                return self.replay('fx_rate', (), {})
+            except Exception as e:
+                EVENTS.warning('fx_fetch_failed', error=str(e))
+                return None
+
+        fx_rates._fetch = fetch_rate
+
+        # A live background refresh lands right after the lookup that started it, and the cycle
+        # keeps the old rate; do the same deterministically on the next lookup instead of a thread
+        pending = []
+        lookup = fx_rates.current_rate
+
+        def current_rate():
+            if pending:
+                pending.clear()
+                fx_rates.refresh()
+            return lookup()
+
+        fx_rates._refresh_in_background = lambda: pending.append(True)
+        fx_rates.current_rate = current_rate
+        signal_state.states = dict(self.state.get('signal_states', {}))
+        portfolio = self.state.get('portfolio')
+        if portfolio and portfolio['initial_cash'] is not None:
+            ledger.load_state(portfolio)
+
+    def install_clock(self, module_names):
+        """Replace `time` in the named modules with the virtual clock"""
+        return install(self.clock, [sys.modules[name] for name in module_names])
+
+    def mark_cycle(self, cycle):
+        """Jump the clock to when the cycle started in the recording"""
+        started = self.cycles.get(cycle)
+        if started is not None and started > self.clock.now:
+            self.clock.now = started
+
+    def close(self):
+        remaining = sum(not event['used'] for events in self.calls.values() for event in events)
+        EVENTS.info('replay_finished', misses=self.misses, unused=remaining)
@@ -0,0 +1,189 @@
+"""Portfolio coordinator: one process owns the ledger, other bot processes trade against it.
+
+The coordinator serves its PortfolioLedger on a Unix socket. Each worker
+keeps one connection and sends one JSON line per request, answered by one
+JSON line. Every request is one call of a ledger method, and those are
+atomic: reserve() either holds the cash or refuses, so two workers can
+never both spend the same balance, and a buy made with a reservation
+can't be beaten to its cash. Connections are served by their own threads
+and a request holds the ledger lock for microseconds; the coordinator
+answers tens of thousands of requests per second while a worker makes a
+few per trade, so scanning capacity grows with the number of workers.
+
+Reservations belong to the connection that made them: when a worker
+disconnects (or dies) the cash it still holds is released.
+
+Workers also publish the signals they act on; the coordinator drains them
+once per cycle into its own log.
+
+The first process to take `{path}.lock` becomes the coordinator, the
+others connect as workers.
+"""
+import fcntl
+import json
+import os
+import queue
+import socket
+import socketserver
+import threading
+import time
+
+# What workers may do with the coordinator's ledger
+LEDGER_METHODS = ('open', 'holds', 'position', 'positions', 'buy', 'sell', 'mark', 'reserve', 'release')
+LEDGER_ATTRIBUTES = ('cash', 'available_cash', 'reserved', 'initial_cash', 'realized_pnl', 'unrealized_pnl',
+                     'exposure', 'equity', 'fills', 'rejected')
+
+
+class CoordinatorError(Exception):
+    """A request the coordinator could not carry out"""
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        coordinator = self.server.coordinator
+        reservations = set()  # keys this worker still holds
+        try:
+            for line in self.rfile:
+                try:
+                    response = {'result': coordinator.handle(json.loads(line), reservations)}
+                except Exception as e:
+                    response = {'error': f"{type(e).__name__}: {e}"}
+                self.wfile.write((json.dumps(response, separators=(',', ':'), default=str) + '\n').encode())
+                self.wfile.flush()
+        finally:
+            for key in reservations:
+                coordinator.ledger.release(key)
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    request_queue_size = 128  # workers starting together
+
+
+class PortfolioCoordinator:
+    """Serves a ledger to worker processes over a Unix socket"""
+
+    def __init__(self, ledger, path, lock_file):
+        self.ledger = ledger
+        self.path = path
+        self.lock_file = lock_file  # from claim_coordinator(), held while serving
+        self.signals = queue.SimpleQueue()  # (worker, signal) published by workers
+
+        if os.path.exists(path):
+            os.unlink(path)  # left by a coordinator that died
+        self._server = _Server(path, _Handler)
+        self._server.coordinator = self
+        self._thread = threading.Thread(target=self._server.serve_forever, name='coordinator', daemon=True)
+        self._thread.start()
+
+    def handle(self, request, reservations=None):
+        """Carry out one request; reservations is the set of keys held by the requesting connection"""
+        op, name = request['op'], request.get('name')
+        if op == 'call' and name in LEDGER_METHODS:
+            result = getattr(self.ledger, name)(*request.get('args', ()), **request.get('kwargs', {}))
+            if reservations is not None and name in ('reserve', 'release', 'buy'):
+                with self.ledger.lock:
+                    if name == 'reserve' and result is not None:
+                        reservations.add(result)
+                    else:
+                        reservations.intersection_update(self.ledger.reservations)
+            return result
+        if op == 'get' and name in LEDGER_ATTRIBUTES:
+            return getattr(self.ledger, name)
+        if op == 'publish':
+            self.signals.put((request['worker'], request['signal']))
+            return True
+        raise CoordinatorError(f"unsupported request {op} {name}")
+
+    def drain_signals(self):
+        """Signals published since the last call, as [(worker, signal)]"""
+        signals = []
+        while True:
+            try:
+                signals.append(self.signals.get_nowait())
+            except queue.Empty:
+                return signals
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self.lock_file.close()
+
+
+class CoordinatorClient:
+    """One worker's connection to the coordinator"""
+
+    def __init__(self, path, worker, timeout=10.0):
+        self.worker = worker
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.settimeout(timeout)
+        try:
+            self._socket.connect(path)
+        except OSError:
+            self._socket.close()
+            raise
+        self._file = self._socket.makefile('rwb')
+        self._lock = threading.Lock()
+
+    def request(self, op, **fields):
+        line = json.dumps({'op': op, **fields}, separators=(',', ':'), default=str) + '\n'
+        with self._lock:
+            self._file.write(line.encode())
+            self._file.flush()
+            reply = self._file.readline()
+        if not reply:
+            raise ConnectionError("portfolio coordinator closed the connection")
+        response = json.loads(reply)
+        if 'error' in response:
+            raise CoordinatorError(response['error'])
+        return response['result']
+
+    def publish(self, signal):
+        return self.request('publish', worker=self.worker, signal=signal)
+
+    def close(self):
+        self._file.close()
+        self._socket.close()
+
+
+class RemoteLedger:
+    """PortfolioLedger look-alike whose calls are carried out by the coordinator"""
+
+    def __init__(self, client):
+        self.client = client
+
+    def __getattr__(self, name):
+        if name in LEDGER_METHODS:
+            return lambda *args, **kwargs: self.client.request('call', name=name, args=args, kwargs=kwargs)
+        if name in LEDGER_ATTRIBUTES:
+            return self.client.request('get', name=name)
+        raise AttributeError(name)
+
+    def close(self):
+        """The coordinator keeps the journal, only the connection is closed"""
+        self.client.close()
+
+
+def claim_coordinator(path):
+    """Open lock file if this process gets to be the coordinator for path, None if another one is"""
+    lock_file = open(path + '.lock', 'w')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        return None
+    return lock_file
+
+
+def connect_worker(path, worker, wait=10.0):
+    """CoordinatorClient to the coordinator at path, waiting up to `wait` seconds for it to listen"""
+    deadline = time.monotonic() + wait
+    while True:
+        try:
+            return CoordinatorClient(path, worker)
+        except (FileNotFoundError, ConnectionRefusedError, BlockingIOError):
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.1)
@@ -0,0 +1,178 @@
+"""Structured event log written off the trading thread.
+
+emit() only appends (time, level, event, fields) to an in-memory queue.
+A background writer drains it every `flush_interval` seconds: each event
+is rendered to the console through its format (a str.format template or
+a function of the fields) and appended to the log file as one JSON line,
+so the console output and the machine-readable log come from the same
+events. A slow console only delays the writer.
+
+When the queue is full, events below WARNING are dropped; warnings and
+errors may use a second queue's worth of room before they are dropped
+too. Dropped events are counted per event name and reported by the
+writer as one 'log_dropped' warning.
+
+EVENTS is the log shared by every module (like METRICS): modules register
+the console formats of their events at import time and main configures
+the file, level and queue size. It writes every event as it is emitted
+until main hands it to the writer thread at the start of the trading
+loop, so startup messages stay in order with the banner print()s.
+"""
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+
+LEVELS = {'DEBUG': 10, 'INFO': 20, 'WARNING': 30, 'ERROR': 40}
+WARNING = LEVELS['WARNING']
+
+
+class EventLog:
+    """Bounded queue of structured events and the thread writing them out"""
+
+    def __init__(self, path=None, level='INFO', formats=None, max_queued=10000, flush_interval=0.1,
+                 console=None, synchronous=False):
+        self.path = path
+        self.level = LEVELS[level]
+        self.formats = dict(formats or {})  # {event: template or function(fields) -> str, None = not shown}
+        self.max_queued = max_queued
+        self.flush_interval = flush_interval
+        self.console = console  # None = sys.stdout at write time
+        self.dropped = {}  # {event: count} since the last report
+        # Write in emit(): during startup, in forked children (they exit without stopping threads) and after close()
+        self.synchronous = synchronous
+
+        self._queue = deque()
+        self._file = None
+        self._lock = threading.Lock()  # one drain at a time
+        self._wake = threading.Event()
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name='event-log', daemon=True)
+        self._thread.start()
+        os.register_at_fork(before=self._lock.acquire, after_in_parent=self._lock.release,
+                            after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        self._lock.release()
+        self._queue.clear()  # the parent writes these
+        self.synchronous = True
+
+    def configure(self, path=None, level='INFO', formats=None, max_queued=10000):
+        """Set the log file, level, extra formats and queue size; the writer keeps running"""
+        with self._lock:
+            if path != self.path and self._file is not None:
+                self._file.close()
+                self._file = None
+            self.path = path
+            self.level = LEVELS[level]
+            self.formats.update(formats or {})
+            self.max_queued = max_queued
+
+    def register(self, event, template):
+        self.formats[event] = template
+
+    def register_formats(self, formats):
+        """Register {event: template} at once"""
+        self.formats.update(formats)
+
+    def emit(self, level, event, **fields):
+        """Queue one event; never blocks"""
+        level_no = LEVELS[level]
+        if level_no < self.level:
+            return
+        queued = len(self._queue)
+        if queued >= self.max_queued:
+            if level_no < WARNING or queued >= 2 * self.max_queued:
+                self.dropped[event] = self.dropped.get(event, 0) + 1
+                return
+        self._queue.append((time.time(), level, event, fields))
+        if self.synchronous:
+            self.flush()
+        elif queued == self.max_queued // 2:
+            self._wake.set()  # filling up, don't wait for the timer
+
+    def debug(self, event, **fields):
+        self.emit('DEBUG', event, **fields)
+
+    def info(self, event, **fields):
+        self.emit('INFO', event, **fields)
+
+    def warning(self, event, **fields):
+        self.emit('WARNING', event, **fields)
+
+    def error(self, event, **fields):
+        self.emit('ERROR', event, **fields)
+
+    def render(self, timestamp, level, event, fields):
+        """Console text of one event, None if it is not shown"""
+        template = self.formats.get(event, '[{level}] {event}: {fields}')
+        if template is None:
+            return None
+        try:
+            if callable(template):
+                return template(fields)
+            return template.format(clock=time.strftime('%H:%M:%S', time.localtime(timestamp)),
+                                   level=level, event=event, fields=fields, **fields)
+        except Exception as e:
+            return f"[{level}] {event}: {fields} (render failed: {e})"
+
+    def flush(self):
+        """Write out everything queued so far"""
+        with self._lock:
+            if self.dropped:
+                from metrics import METRICS  # metrics logs through EVENTS, so import it late
+                dropped, self.dropped = self.dropped, {}
+                for event, count in dropped.items():
+                    METRICS.inc('log_events_dropped_total', count, event=event)
+                self._queue.append((time.time(), 'WARNING', 'log_dropped', {'counts': dropped}))
+
+            lines, records = [], []
+            while self._queue:
+                timestamp, level, event, fields = self._queue.popleft()
+                text = self.render(timestamp, level, event, fields)
+                if text is not None:
+                    lines.append(text)
+                if self.path:
+                    records.append(json.dumps({'t': timestamp, 'level': level, 'event': event, **fields},
+                                              separators=(',', ':'), ensure_ascii=False, default=str))
+            if not lines and not records:
+                return
+
+            try:
+                if lines:
+                    console = self.console or sys.stdout
+                    console.write('\n'.join(lines) + '\n')
+                    console.flush()
+                if records:
+                    if self._file is None:
+                        self._file = open(self.path, 'a', encoding='utf-8')
+                    self._file.write('\n'.join(records) + '\n')
+                    self._file.flush()
+            except Exception as e:
+                sys.stderr.write(f"[ERROR] Event log write failed: {e}\n")
+
+    def _run(self):
+        while not self._stop:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def close(self):
+        """Stop the writer after writing out the queue"""
+        self._stop = True
+        self._wake.set()
+        if not self.synchronous:
+            self._thread.join()
+        self.synchronous = True
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+EVENTS = EventLog(synchronous=True)
+atexit.register(EVENTS.flush)  # tools that never close() it still get their last events out
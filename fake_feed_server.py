@@ -0,0 +1,96 @@
+"""Local fake websocket feed for testing the streaming mode offline.
+
+Serves Binance-style combined-stream kline (or trade) messages with a random
+walk price. Candle time advances one timeframe every --ticks-per-candle
+messages, so candle closes happen in seconds instead of hours.
+
+Usage:
+    python fake_feed_server.py --symbols BTCUSDT,ETHUSDT --port 8765
+    (then set STREAM_URL = 'ws://localhost:8765' in main.py)
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from candle_cache import timeframe_to_ms
+
+
+async def kline_feed(websocket, market_ids, timeframe, interval, ticks_per_candle, mode):
+    timeframe_ms = timeframe_to_ms(timeframe)
+    start = int(time.time() * 1000) // timeframe_ms * timeframe_ms
+    prices = {market_id: random.uniform(10, 1000) for market_id in market_ids}
+    candles = {}
+    tick = 0
+
+    while True:
+        candle_index, tick_in_candle = divmod(tick, ticks_per_candle)
+        open_ts = start + candle_index * timeframe_ms
+        closing = tick_in_candle == ticks_per_candle - 1
+
+        for market_id in market_ids:
+            price = prices[market_id] = prices[market_id] * random.uniform(0.995, 1.005)
+            amount = random.uniform(0.01, 1.0)
+
+            if mode == 'trade':
+                trade_ts = open_ts + tick_in_candle * timeframe_ms // ticks_per_candle
+                data = {'e': 'trade', 's': market_id, 'T': trade_ts, 'p': f"{price:.8f}", 'q': f"{amount:.8f}"}
+                stream = f"{market_id.lower()}@trade"
+            else:
+                candle = candles.get(market_id)
+                if candle is None or candle['t'] != open_ts:
+                    candle = candles[market_id] = {'t': open_ts, 'o': price, 'h': price, 'l': price, 'v': 0.0}
+                candle['h'] = max(candle['h'], price)
+                candle['l'] = min(candle['l'], price)
+                candle['v'] += amount
+                kline = {
+                    't': open_ts, 'T': open_ts + timeframe_ms - 1, 's': market_id, 'i': timeframe,
+                    'o': f"{candle['o']:.8f}", 'h': f"{candle['h']:.8f}", 'l': f"{candle['l']:.8f}",
+                    'c': f"{price:.8f}", 'v': f"{candle['v']:.8f}", 'x': closing,
+                }
+                data = {'e': 'kline', 'E': int(time.time() * 1000), 's': market_id, 'k': kline}
+                stream = f"{market_id.lower()}@kline_{timeframe}"
+
+            await websocket.send(json.dumps({'stream': stream, 'data': data}))
+
+        tick += 1
+        await asyncio.sleep(interval)
+
+
+async def serve(args):
+    import websockets
+
+    market_ids = [market_id.strip().upper() for market_id in args.symbols.split(',') if market_id.strip()]
+
+    async def handler(websocket, *_):
+        print(f"[INFO] Client connected, streaming {len(market_ids)} symbols")
+        try:
+            await kline_feed(websocket, market_ids, args.timeframe, args.interval,
+                             args.ticks_per_candle, args.mode)
+        except websockets.ConnectionClosed:
+            print("[INFO] Client disconnected")
+
+    async with websockets.serve(handler, args.host, args.port):
+        print(f"[INFO] Fake feed listening on ws://{args.host}:{args.port}")
+        await asyncio.Future()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fake Binance-style websocket feed')
+    parser.add_argument('--symbols', default='BTCUSDT,ETHUSDT', help='comma-separated market ids')
+    parser.add_argument('--timeframe', default='1h')
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--interval', type=float, default=0.1, help='seconds between messages')
+    parser.add_argument('--ticks-per-candle', type=int, default=20)
+    parser.add_argument('--mode', choices=['kline', 'trade'], default='kline')
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        print("\n[INFO] Fake feed stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+import json
+import os
+import threading
+import time
+import requests
+from metrics import METRICS
+from event_log import EVENTS
+
+EVENTS.register_formats({
+    'fx_cache_unreadable': "[WARNING] Ignoring unreadable FX cache {file}: {error}",
+    'fx_cache_write_failed': "[WARNING] Failed to persist FX rate: {error}",
+    'fx_http_error': "[WARNING] FX rate API returned HTTP {status}",
+    'fx_fetch_failed': "[WARNING] Failed to fetch USD/BRL rate: {error}",
+    'fx_fallback': "[WARNING] Using fallback USD/BRL rate.",
+})
+
+
+FX_API_URL = 'https://open.er-api.com/v6/latest/USD'
+
+
+class FxRateProvider:
+    """USD/BRL rate with TTL cache, background refresh and on-disk last-known-good value
+
+    Failed fetches are retried in the background after retry_delay seconds,
+    doubling on every failure up to the TTL, so an FX API outage costs at
+    most one blocking request (on a cold start) instead of one per cycle.
+    """
+
+    def __init__(self, ttl=3600, cache_file='.fx_rate_cache.json', fallback_rate=5.2, timeout=5, retry_delay=60):
+        self.ttl = ttl
+        self.cache_file = cache_file
+        self.fallback_rate = fallback_rate
+        self.timeout = timeout
+        self.retry_delay = retry_delay
+
+        self.rate = None
+        self.fetched_at = 0.0
+        self.failures = 0  # consecutive failed fetches
+        self.failed_at = 0.0
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+        self._load_cache()
+
+    def _load_cache(self):
+        """Load last-known-good rate from disk"""
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return
+        try:
+            with open(self.cache_file) as f:
+                data = json.load(f)
+            self.rate = float(data['rate'])
+            self.fetched_at = float(data['fetched_at'])
+        except Exception as e:
+            EVENTS.warning('fx_cache_unreadable', file=self.cache_file, error=str(e))
+
+    def _save_cache(self):
+        """Persist last-known-good rate atomically"""
+        if not self.cache_file:
+            return
+        try:
+            tmp_file = self.cache_file + '.tmp'
+            with open(tmp_file, 'w') as f:
+                json.dump({'rate': self.rate, 'fetched_at': self.fetched_at}, f)
+            os.replace(tmp_file, self.cache_file)
+        except Exception as e:
+            EVENTS.warning('fx_cache_write_failed', error=str(e))
+
+    def _fetch(self):
+        """Fetch the rate from the network, returns None on failure"""
+        METRICS.inc('api_calls_total', method='fx_rate')
+        try:
+            with METRICS.timer('api_call_seconds', method='fx_rate'):
+                response = requests.get(FX_API_URL, timeout=self.timeout)
+            if response.status_code == 200:
+                return float(response.json()['rates']['BRL'])
+            EVENTS.warning('fx_http_error', status=response.status_code)
+        except Exception as e:
+            EVENTS.warning('fx_fetch_failed', error=str(e))
+        METRICS.inc('api_errors_total', method='fx_rate')
+        return None
+
+    def refresh(self):
+        """Fetch a fresh rate and store it as last-known-good"""
+        try:
+            rate = self._fetch()
+            with self._lock:
+                if rate is not None:
+                    self.rate = rate
+                    self.fetched_at = time.time()
+                    self.failures = 0
+                else:
+                    self.failures += 1
+                    self.failed_at = time.time()
+            if rate is not None:
+                self._save_cache()
+            return rate
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self.refresh, name='fx-refresh', daemon=True).start()
+
+    def _retry_due(self):
+        """False while backing off after a failed fetch"""
+        if not self.failures:
+            return True
+        delay = min(self.ttl, self.retry_delay * 2 ** (self.failures - 1))
+        return time.time() - self.failed_at >= delay
+
+    def current_rate(self):
+        """Return the cached rate, refreshing in the background once it is stale"""
+        if self.rate is None:
+            if not self.failures:
+                # Cold start without a cache file: block once, then never again
+                with self._lock:
+                    self._refreshing = True
+                if self.refresh() is not None:
+                    return self.rate
+                EVENTS.warning('fx_fallback', rate=self.fallback_rate)
+            elif self._retry_due():
+                self._refresh_in_background()
+            return self.fallback_rate
+        if time.time() - self.fetched_at > self.ttl and self._retry_due():
+            self._refresh_in_background()
+        return self.rate
+
+    def begin_cycle(self):
+        """Freeze one rate for the whole cycle so every conversion uses the same value"""
+        self._snapshot = None
+        self._snapshot = self.current_rate()
+        return self._snapshot
+
+    def get_rate(self):
+        """Rate for the current cycle, or the cached rate outside of a cycle"""
+        if self._snapshot is not None:
+            return self._snapshot
+        return self.current_rate()
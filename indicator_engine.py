@@ -0,0 +1,197 @@
+import functools
+
+import numpy as np
+
+
+@functools.lru_cache(maxsize=None)
+def _smoothing_weights(alpha, width):
+    """Row m holds the weights that reduce exponential smoothing of the last m values of a
+    `width`-wide row to one dot product (seeded with the first value, as pandas ewm(adjust=False))"""
+    weights = np.zeros((width + 1, width))
+    for m in range(1, width + 1):
+        decay = (1 - alpha) ** np.arange(m - 1, -1, -1)
+        weights[m, width - m:] = alpha * decay
+        weights[m, width - m] = decay[0]
+    return weights
+
+
+def _smooth(values, alpha, valid):
+    """Exponentially smoothed last value of each row, whose last `valid` entries are data"""
+    weights = _smoothing_weights(alpha, values.shape[1])[valid]
+    return np.einsum('ij,ij->i', np.nan_to_num(values), weights)
+
+
+def _require(values, counts, needed):
+    """Blank out rows with too little history"""
+    values[counts < needed] = np.nan
+    return values
+
+
+def sma(high, low, close, counts, period):
+    return _require(close[:, -period:].mean(axis=1), counts, period)
+
+
+def ema(high, low, close, counts, period):
+    return _require(_smooth(close, 2 / (period + 1), counts), counts, period)
+
+
+def rsi(high, low, close, counts, period=14):
+    """Wilder's RSI (0-100)"""
+    change = np.diff(close, axis=1)
+    valid = np.maximum(counts - 1, 0)
+    avg_gain = _smooth(np.clip(change, 0, None), 1 / period, valid)
+    avg_loss = _smooth(np.clip(-change, 0, None), 1 / period, valid)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        values = 100 - 100 / (1 + avg_gain / avg_loss)
+    values = np.where(avg_loss == 0, np.where(avg_gain == 0, 50.0, 100.0), values)
+    return _require(values, counts, period + 1)
+
+
+def bollinger(high, low, close, counts, period=20, k=2.0):
+    window = close[:, -period:]
+    mid = window.mean(axis=1)
+    width = k * window.std(axis=1)
+    return {
+        'mid': _require(mid, counts, period),
+        'upper': _require(mid + width, counts, period),
+        'lower': _require(mid - width, counts, period),
+    }
+
+
+def atr(high, low, close, counts, period=14):
+    """Wilder's Average True Range"""
+    previous = close[:, :-1]
+    true_range = np.maximum(high[:, 1:] - low[:, 1:],
+                            np.maximum(np.abs(high[:, 1:] - previous), np.abs(low[:, 1:] - previous)))
+    return _require(_smooth(true_range, 1 / period, np.maximum(counts - 1, 0)), counts, period + 1)
+
+
+INDICATORS = {'sma': sma, 'ema': ema, 'rsi': rsi, 'bollinger': bollinger, 'atr': atr}
+HISTORY_NEEDED = {'rsi': 1, 'atr': 1}  # extra candles beyond `period`
+
+
+class IndicatorEngine:
+    """Indicators for the whole universe, computed over 2-D (symbols x candles) buffers
+
+    Each symbol owns one row holding its last `window` candles, right-aligned
+    (missing history is NaN). compute() runs every registered indicator once
+    over all rows that changed, so the Python overhead per pass depends on
+    the window and the number of indicators, not on the number of symbols.
+    """
+
+    def __init__(self, window, capacity=64):
+        self.window = window
+        self.rows = {}        # {symbol: row index}
+        self.last_ts = {}     # {symbol: timestamp of the newest loaded candle}
+        self.indicators = {}  # {name: (function, params)}
+        self.results = {}     # {output name: 1-D array, one value per row}
+        self.dirty = set()    # rows updated since the last compute()
+        self.passes = 0
+
+        self.high = np.full((capacity, window), np.nan)
+        self.low = np.full((capacity, window), np.nan)
+        self.close = np.full((capacity, window), np.nan)
+        self.counts = np.zeros(capacity, dtype=int)  # candles loaded per row
+
+    def _grow(self):
+        """Double the number of rows"""
+        def grow(array, fill):
+            grown = np.full((2 * len(array),) + array.shape[1:], fill, dtype=array.dtype)
+            grown[:len(array)] = array
+            return grown
+
+        self.high, self.low, self.close = grow(self.high, np.nan), grow(self.low, np.nan), grow(self.close, np.nan)
+        self.counts = grow(self.counts, 0)
+        self.results = {name: grow(values, np.nan) for name, values in self.results.items()}
+
+    def register(self, name, kind, **params):
+        """Add an indicator ('sma', 'ema', 'rsi', 'bollinger', 'atr' or a function) under name"""
+        function = INDICATORS[kind] if isinstance(kind, str) else kind
+        needed = params.get('period', 14) + HISTORY_NEEDED.get(kind, 0)
+        if needed > self.window:
+            raise ValueError(f"indicator {name} needs {needed} candles, the window holds {self.window}")
+        self.indicators[name] = (function, params)
+        self.dirty.update(self.rows.values())
+
+    def _row(self, symbol):
+        row = self.rows.get(symbol)
+        if row is None:
+            row = self.rows[symbol] = len(self.rows)
+            if row >= len(self.close):
+                self._grow()
+        return row
+
+    def reset(self, symbol):
+        """Reload the symbol's row from scratch on its next update, e.g. after its history was refetched"""
+        self.last_ts.pop(symbol, None)
+
+    def update_candles(self, symbol, candles):
+        """Load the symbol's latest OHLCV candles (the cache's full list, forming candle last)
+
+        Only candles from the last loaded one onwards are converted; older ones are shifted in place.
+        """
+        if not candles:
+            return
+        row = self._row(symbol)
+        last_ts = self.last_ts.get(symbol)
+
+        new = 0
+        while new < len(candles) and last_ts is not None and candles[-1 - new][0] > last_ts:
+            new += 1
+        if last_ts is None or new >= len(candles) or new >= self.window or candles[-1 - new][0] != last_ts:
+            tail, shift = candles[-self.window:], None  # first load or history changed: reload the row
+        else:
+            tail, shift = candles[-1 - new:], new
+
+        data = np.asarray(tail, dtype=float)
+        count = len(data)
+        for buffer, column in ((self.high, 2), (self.low, 3), (self.close, 4)):
+            if shift is None:
+                buffer[row, :self.window - count] = np.nan
+            elif shift:
+                buffer[row, :-shift] = buffer[row, shift:]
+            buffer[row, self.window - count:] = data[:, column]
+
+        self.counts[row] = count if shift is None else min(self.counts[row] + shift, self.window)
+        self.last_ts[symbol] = candles[-1][0]
+        self.dirty.add(row)
+
+    def compute(self):
+        """One vectorized pass over every row updated since the last pass"""
+        if not self.dirty:
+            return
+        used = len(self.rows)
+        if len(self.dirty) == used:
+            rows = slice(0, used)  # whole universe: views, no copies
+        else:
+            rows = np.fromiter(sorted(self.dirty), dtype=int)
+        self.dirty = set()
+        self.passes += 1
+
+        high, low, close, counts = self.high[rows], self.low[rows], self.close[rows], self.counts[rows]
+        for name, (function, params) in self.indicators.items():
+            output = function(high, low, close, counts, **params)
+            outputs = {f"{name}_{key}": values for key, values in output.items()} if isinstance(output, dict) else {name: output}
+            for output_name, values in outputs.items():
+                if output_name not in self.results:
+                    self.results[output_name] = np.full(len(self.close), np.nan)
+                self.results[output_name][rows] = values
+
+    def get(self, symbol, name):
+        """Latest value of one indicator output for symbol, None if not available"""
+        row = self.rows.get(symbol)
+        if row is None:
+            return None
+        self.compute()
+        values = self.results.get(name)
+        if values is None or np.isnan(values[row]):
+            return None
+        return float(values[row])
+
+    def values(self, symbol):
+        """All indicator outputs for symbol as {name: float or None}"""
+        row = self.rows.get(symbol)
+        if row is None:
+            return {}
+        self.compute()
+        return {name: None if np.isnan(values[row]) else float(values[row]) for name, values in self.results.items()}
@@ -1,9 +1,28 @@
 import ccxt
+import asyncio
 import os
+import sys
 import time
-import statistics
-import requests
 from dotenv import load_dotenv
+from fx_rates import FxRateProvider
+from candle_cache import CandleCache, timeframe_to_ms
+from candle_store import CandleStore
+from sma_engine import RollingSMA
+from resampler import TimeframeResampler
+from async_scan import TokenBucket, create_async_exchange, scan_symbols
+from price_snapshot import PriceSnapshot
+from signal_state import SignalStateMachine
+from scheduler import CandleScheduler, CLOSE
+from streaming import CandleBuilder, binance_stream_url, run_stream
+from universe import ShardPool, filter_symbols, instance_symbols
+from order_executor import OrderExecutor
+from metrics import METRICS, instrument_exchange, start_http_server
+from market_cache import apply_cached_markets, load_markets_cached, probe_exchanges, write_cached_markets
+from cassette import CassettePlayer, CassetteRecorder
+from market_data import HedgedMarketData
+from portfolio_ledger import PortfolioLedger
+from event_log import EVENTS
+from coordinator import PortfolioCoordinator, RemoteLedger, claim_coordinator, connect_worker
 
 # Load environment variables
 load_dotenv()
@@ -14,11 +33,97 @@ TIMEFRAME = '1h'  # 1-hour candlesticks for analysis
 SHORT_MA = 5      # Short-term Simple Moving Average period
 LONG_MA = 20      # Long-term Simple Moving Average period
 CHECK_INTERVAL = 60  # Check interval in seconds
+MAX_CYCLES = None    # Stop after this many cycles (None = run until Ctrl+C)
+CONFIRM_TIMEFRAMES = []  # Higher timeframes (e.g. ['4h', '1d']) whose SMAs must agree, resampled from TIMEFRAME
+OHLCV_CACHE_SIZE = max([LONG_MA + 5] + [  # Closed candles kept per symbol (plus the forming one)
+    (LONG_MA + 1) * (timeframe_to_ms(tf) // timeframe_to_ms(TIMEFRAME)) + 5 for tf in CONFIRM_TIMEFRAMES])
+CANDLE_STORE_DIR = 'candles'     # On-disk candle history for warm starts (None to disable)
+CANDLE_STORE_MAX_CATCHUP = 1000  # Candles fetched with since= after a restart before giving up on the gap
+ASYNC_SCAN = False    # Fetch market data for all symbols concurrently (ccxt async support)
+SCAN_CONCURRENCY = 10  # Max in-flight requests when ASYNC_SCAN is enabled
+STREAMING_MODE = False  # Event-driven mode: evaluate on websocket candle updates instead of polling
+STREAM_URL = None       # None = Binance kline streams; 'ws://localhost:8765' for fake_feed_server.py
+STREAM_EVAL_ON_TICK = True  # Evaluate on every price move, not only when a candle closes
+
+# Agendamento
+ALIGN_TO_CANDLES = False     # Wake just after each TIMEFRAME candle close instead of every CHECK_INTERVAL
+CANDLE_CLOSE_DELAY = 2.0     # Seconds after the close before fetching, gives the exchange time to publish
+SCHEDULER_JITTER = 0.0       # Random extra delay (seconds) so several instances don't wake together
+SHARD_JITTER = 0.0           # Extra start delay per shard index (seconds)
+INTRA_CANDLE_INTERVAL = None  # Seconds between evaluations of the forming candle (None = only on close)
+NEW_CANDLE_RETRY_DELAY = 5.0  # Re-fetch symbols whose new candle is not published yet after this delay
+
+# Sinais
+EDGE_TRIGGERED_SIGNALS = True        # Trade only when the SMAs cross, not on every cycle of a trend
+SIGNAL_THRESHOLD_PCT = 0.0           # Minimum signal strength (%) for a crossover to count
+SIGNAL_STATE_FILE = '.signal_state.json'  # Last SMA relationship per symbol, survives restarts
+
+# Indicadores
+INDICATOR_WINDOW = OHLCV_CACHE_SIZE + 1  # Candles per symbol in the indicator buffers (all cached ones)
+INDICATORS = {}  # name: (kind, params), e.g. {'rsi': ('rsi', {'period': 14}), 'atr': ('atr', {'period': 14})} (needs numpy)
+
+# Universo de símbolos
+MAX_SYMBOLS = None          # None = every active USD/USDT pair
+MIN_QUOTE_VOLUME_USD = 0    # Skip pairs with less 24h volume (0 = no filter)
+MAX_SPREAD_PCT = None       # Skip pairs with a wider bid/ask spread (None = no filter)
+SHARD_COUNT = 0             # Scanner worker processes (0 = scan in the main process)
+SHARD_RATE_LIMIT_MS = None  # Per-shard rateLimit (None = exchange.rateLimit * SHARD_COUNT)
+
+# Execução de ordens (modo real)
+ORDER_MAX_RETRIES = 5         # Retries for transient network errors
+ORDER_RETRY_BASE_DELAY = 1.0  # Seconds, doubled on every retry
+ORDER_RETRY_MAX_DELAY = 30.0  # Upper bound for the retry delay
+ORDER_ID_PREFIX = 'memedig'   # Prefix of the client order ids
+
+# Métricas
+METRICS_HOST = '127.0.0.1'   # Prometheus endpoint bind address (local only)
+METRICS_PORT = 9108          # Prometheus endpoint port (None to disable)
+METRICS_CYCLE_LOG = 'metrics_cycles.jsonl'  # Per-cycle JSON records (None to disable)
+
+# Gravação / replay
+CASSETTE_MODE = None                  # 'record' = save every exchange/FX response, 'replay' = rerun offline from it
+CASSETTE_FILE = 'session.cassette.gz'  # Gzipped JSON lines
+
+# Dados de mercado
+HEDGED_DATA_SOURCES = []  # Extra ccxt ids kept warm for candles, e.g. ['kraken', 'bitfinex'] (orders stay on the main exchange)
+HEDGE_DELAY = 0.3         # Seconds without an answer before the next source is asked too
+HEDGE_TIMEOUT = 10.0      # Seconds before a candle fetch gives up on every source
+
+# Inicialização da exchange
+MARKETS_CACHE_DIR = '.markets_cache'  # load_markets() results cached on disk
+MARKETS_CACHE_TTL = 6 * 3600          # Seconds before cached markets are reloaded
+PUBLIC_EXCHANGES = [                  # (ccxt id, probe symbol), probed concurrently, the first healthy one in this order is used
+    ('binance', 'BTC/USDT'),
+    ('kraken', 'BTC/USD'),
+    ('bitfinex', 'BTC/USD'),
+    ('coinbasepro', 'BTC/USD'),
+]
 
 # Configurações de saldo em BRL - VALORES REDUZIDOS PARA TESTES REAIS
 INITIAL_BALANCE_BRL = 20.0   # Saldo inicial em reais (reduzido para testes)
 MIN_TRADE_AMOUNT_BRL = 1.0   # Valor mínimo por operação em reais (reduzido para testes)
 
+# Carteira
+PORTFOLIO_JOURNAL_FILE = '.portfolio_dry_run.journal' if DRY_RUN else '.portfolio.journal'  # Fill journal, the portfolio survives restarts (None = memory only)
+PORTFOLIO_SNAPSHOT_EVERY = 500  # Journal entries between snapshots, a restart replays at most this many
+PORTFOLIO_FSYNC = True          # fsync every fill before trading on
+
+# Coordenação (várias instâncias)
+COORDINATOR_SOCKET = None  # Unix socket, e.g. '/tmp/memedig.sock': the first instance owns the portfolio, the others trade through it
+INSTANCE_INDEX = 0         # This instance scans the base currencies whose hash % INSTANCE_COUNT == INSTANCE_INDEX
+INSTANCE_COUNT = 1
+
+# Log de eventos
+EVENT_LOG_FILE = 'events.jsonl'  # Structured JSON-lines log of everything shown on the console (None = console only)
+EVENT_LOG_LEVEL = 'INFO'         # DEBUG, INFO, WARNING or ERROR
+EVENT_LOG_QUEUE = 10000          # Events buffered for the writer thread; beyond that INFO events are dropped
+
+# Cotação USD/BRL
+FX_RATE_TTL = 3600                 # Seconds before the cached USD/BRL rate is refreshed
+FX_CACHE_FILE = '.fx_rate_cache.json'  # Last-known-good rate, survives restarts
+FX_FALLBACK_RATE = 5.2             # Used only if no rate was ever fetched
+FX_RETRY_DELAY = 60                # Seconds before a failed fetch is retried, doubled per failure up to FX_RATE_TTL
+
 # Converter para USD (será calculado dinamicamente)
 def get_initial_balance_usd():
     return INITIAL_BALANCE_BRL / get_usd_to_brl_rate()
@@ -26,25 +131,69 @@ def get_initial_balance_usd():
 def get_trade_amount_usd():
     return MIN_TRADE_AMOUNT_BRL / get_usd_to_brl_rate()
 
-# Global variables for portfolio tracking (will be initialized in main)
-portfolio_balance = 0.0
-portfolio_holdings = {}  # {symbol: {'amount': float, 'avg_price': float}}
-total_trades = 0
-successful_trades = 0
+order_executor = None  # Background order pipeline, started in main() for real trading
+cassette = None  # CassetteRecorder or CassettePlayer when CASSETTE_MODE is set
+coordinator = None  # PortfolioCoordinator when this instance serves the portfolio to others
+coordinator_client = None  # CoordinatorClient when another instance owns the portfolio
+data_router = None  # HedgedMarketData when HEDGED_DATA_SOURCES is set
+
+# Console text of the events, rendered by the log writer thread ({clock} = HH:MM:SS of the event)
+EVENT_FORMATS = {
+    'streaming': "[INFO] Streaming mode: {symbols} symbols, timeframe {timeframe}",
+    'cycle_start': "\n[CYCLE {cycle}] Starting market analysis...",
+    'cycle_complete': "[CYCLE {cycle}] Analysis complete ({symbols} symbols fetched).",
+    'data_sources': "[INFO] Market data sources: {status}",
+    'max_cycles': "[INFO] Reached MAX_CYCLES ({max_cycles})",
+    'waiting': "Waiting {seconds} seconds...",
+    'waiting_candle': "Waiting for the next {timeframe} candle event...",
+    'stopped': "\n[INFO] Trading bot stopped by user (Ctrl+C)",
+    'fatal': "\n[FATAL] Unexpected error in main loop: {error}",
+    'draining_orders': "[INFO] Waiting for queued orders...",
+    'shutdown': "[INFO] Trading bot shutting down...",
+    'insufficient_data': "[WARNING] Insufficient data for {symbol} (need {need}, got {got})",
+    'fetch_failed': "[ERROR] Failed to fetch data for {symbol}: {error}",
+    'sma_unavailable': "[WARNING] Cannot calculate SMAs for {symbol}",
+    'analysis': (f"[{{clock}}] {{symbol}}: Price=${{price:.2f}} (R${{price_brl:.2f}}) | "
+                 f"SMA{SHORT_MA}=${{short_sma:.2f}} | SMA{LONG_MA}=${{long_sma:.2f}} | "
+                 f"Signal={{signal}} ({{signal_strength:.2f}}%)"),
+    'crossover': "[{clock}] {symbol}: SMA crossover -> {signal}",
+    'unconfirmed': "[{clock}] {symbol}: {signal} not confirmed on {timeframes} yet, holding off",
+    'analyze_failed': "[ERROR] Error analyzing {symbol}: {error}",
+    'signal_failed': "[ERROR] Failed to handle signal for {symbol}: {error}",
+    'simulated_buy': "[SIMULAÇÃO] ✅ Compra executada: {amount:.6f} {currency} por ${value:,.2f} (R${value_brl:,.2f})",
+    'worker_signal': "[INFO] {worker}: {symbol} {signal} @ ${price:.2f}",
+    'simulated_trade_failed': "[ERROR] Erro na simulação de trade para {symbol}: {error}",
+    'buy_queued': "[TRADE] Queueing BUY order for {amount:.8f} {currency} (${value})",
+    'sell_queued': "[TRADE] Queueing SELL order for {amount:.8f} {currency}",
+    'order_in_flight': "[INFO] {side} order for {symbol} already in flight, skipping",
+    'order_failed': "[ERROR] Failed to execute {signal} order for {symbol}: {error}",
+    'fill': "[SUCCESS] {action} filled: {amount:.8f} {symbol} @ ${price:,.2f} ({client_order_id})",
+    'fill_mismatch': "[WARNING] {action} fill for {symbol} ({client_order_id}) does not match the tracked portfolio",
+    'fill_failed': "[ERROR] Failed to apply {action} fill for {symbol} ({client_order_id}): {error}",
+}
+
+event_log = EVENTS  # shared with the other modules, their messages go through the same writer
+event_log.configure(EVENT_LOG_FILE, EVENT_LOG_LEVEL, EVENT_FORMATS, max_queued=EVENT_LOG_QUEUE)
+fx_rates = FxRateProvider(ttl=FX_RATE_TTL, cache_file=FX_CACHE_FILE, fallback_rate=FX_FALLBACK_RATE,
+                          retry_delay=FX_RETRY_DELAY)
+candle_store = CandleStore(CANDLE_STORE_DIR) if CANDLE_STORE_DIR else None
+candle_cache = CandleCache(TIMEFRAME, OHLCV_CACHE_SIZE, store=candle_store,
+                           max_delta=CANDLE_STORE_MAX_CATCHUP if candle_store else None)
+sma_engine = RollingSMA([SHORT_MA, LONG_MA])
+resampler = TimeframeResampler(TIMEFRAME, CONFIRM_TIMEFRAMES, LONG_MA + 5)
+indicator_engine = None  # IndicatorEngine when INDICATORS are configured
+if INDICATORS:
+    from indicator_engine import IndicatorEngine
+    indicator_engine = IndicatorEngine(INDICATOR_WINDOW)
+    for indicator_name, (indicator_kind, indicator_params) in INDICATORS.items():
+        indicator_engine.register(indicator_name, indicator_kind, **indicator_params)
+price_snapshot = PriceSnapshot()
+signal_state = SignalStateMachine(SIGNAL_STATE_FILE, threshold_pct=SIGNAL_THRESHOLD_PCT)
+ledger = None  # PortfolioLedger, or a RemoteLedger on worker instances; set up and opened in main()
 
 def get_usd_to_brl_rate():
-    """Get current USD to BRL exchange rate"""
-    try:
-        response = requests.get('https://open.er-api.com/v6/latest/USD', timeout=5)
-        if response.status_code == 200:
-            data = response.json()
-            return data['rates']['BRL']
-        else:
-            # Fallback rate if API fails
-            return 5.2
-    except Exception as e:
-        print(f"[WARNING] Failed to fetch USD/BRL rate: {e}. Using fallback rate.")
-        return 5.2
+    """Get current USD to BRL exchange rate (cached, one snapshot per cycle)"""
+    return fx_rates.get_rate()
 
 def usd_to_brl(usd_amount):
     """Convert USD amount to BRL"""
@@ -60,150 +209,124 @@ def format_currency(amount, currency='USD'):
     else:
         return f"{amount:,.2f} {currency}"
 
-def update_portfolio(symbol, action, amount, price):
-    """Update portfolio holdings and balance"""
-    global portfolio_balance, portfolio_holdings, total_trades, successful_trades
-    
+def update_portfolio(symbol, action, amount, price, reservation=None):
+    """Apply a fill to the portfolio ledger, False if it does not fit (no cash / no position)"""
     base_currency = symbol.split('/')[0]
     
     if action == "BUY":
-        total_cost = amount * price
-        if portfolio_balance >= total_cost:
-            portfolio_balance -= total_cost
-            
-            if base_currency in portfolio_holdings:
-                # Update average price
-                current_amount = portfolio_holdings[base_currency]['amount']
-                current_avg_price = portfolio_holdings[base_currency]['avg_price']
-                total_amount = current_amount + amount
-                new_avg_price = ((current_amount * current_avg_price) + (amount * price)) / total_amount
-                
-                portfolio_holdings[base_currency] = {
-                    'amount': total_amount,
-                    'avg_price': new_avg_price
-                }
-            else:
-                portfolio_holdings[base_currency] = {
-                    'amount': amount,
-                    'avg_price': price
-                }
-            
-            total_trades += 1
-            successful_trades += 1
-            return True
-        else:
-            return False
-            
+        return ledger.buy(base_currency, amount, price, reservation=reservation)
     elif action == "SELL":
-        if base_currency in portfolio_holdings and portfolio_holdings[base_currency]['amount'] >= amount:
-            portfolio_holdings[base_currency]['amount'] -= amount
-            portfolio_balance += amount * price
-            
-            if portfolio_holdings[base_currency]['amount'] <= 0:
-                del portfolio_holdings[base_currency]
-            
-            total_trades += 1
-            successful_trades += 1
-            return True
-        else:
-            return False
+        return ledger.sell(base_currency, amount, price)
     
     return False
 
+def mark_to_market(exchange):
+    """Value the held currencies at this cycle's prices (one bulk request at most)"""
+    currencies = [currency for currency, *_ in ledger.positions()]
+    price_snapshot.ensure(exchange, currencies)
+    for currency in currencies:
+        ledger.mark(currency, price_snapshot.price_for(currency))
+
 def calculate_portfolio_value(exchange):
     """Calculate total portfolio value in USD"""
-    global portfolio_balance, portfolio_holdings
-    
-    total_value = portfolio_balance
-    
-    for currency, holding in portfolio_holdings.items():
-        try:
-            symbol = f"{currency}/USD"
-            ticker = exchange.fetch_ticker(symbol)
-            current_price = ticker['last']
-            holding_value = holding['amount'] * current_price
-            total_value += holding_value
-        except:
-            # If can't get current price, use average price
-            holding_value = holding['amount'] * holding['avg_price']
-            total_value += holding_value
-            
-    return total_value
+    # Positions without a price this cycle keep their last mark
+    mark_to_market(exchange)
+    return ledger.equity
 
+@METRICS.timed('phase_seconds', phase='summary')
 def print_portfolio_summary(exchange, cycle_count):
-    """Print detailed portfolio summary"""
-    global portfolio_balance, portfolio_holdings, total_trades, successful_trades
+    """Log the portfolio summary (rendered by render_portfolio_summary)"""
+    if ledger.positions():
+        # One bulk request at most; prices seen during analysis are reused
+        mark_to_market(exchange)
     
-    print("\n" + "="*80)
-    print(f"📊 RESUMO DO PORTFÓLIO - CICLO {cycle_count}")
-    print("="*80)
-    
-    # Current balance and trading status
-    print(f"💰 Saldo em Caixa: {format_currency(portfolio_balance)} | {format_currency(usd_to_brl(portfolio_balance), 'BRL')}")
+    event_log.info('portfolio_summary', cycle=cycle_count, fx_rate=get_usd_to_brl_rate(),
+                   cash=ledger.cash, trade_amount=get_trade_amount_usd(),
+                   positions=[[currency, amount, avg_price, mark_price, price_snapshot.price_for(currency) is not None]
+                              for currency, amount, avg_price, mark_price in ledger.positions()],
+                   exposure=ledger.exposure, equity=ledger.equity,
+                   initial=ledger.initial_cash or get_initial_balance_usd(),
+                   realized_pnl=ledger.realized_pnl, unrealized_pnl=ledger.unrealized_pnl,
+                   fills=ledger.fills, rejected=ledger.rejected)
+
+def render_portfolio_summary(summary):
+    """Console text of a portfolio_summary event"""
+    rate = summary['fx_rate']
+    cash = summary['cash']
+    trade_amount_usd = summary['trade_amount']
+    lines = [
+        "\n" + "="*80,
+        f"📊 RESUMO DO PORTFÓLIO - CICLO {summary['cycle']}",
+        "="*80,
+        f"💰 Saldo em Caixa: {format_currency(cash)} | {format_currency(cash * rate, 'BRL')}",
+    ]
     
-    # Check if we can buy more assets
-    trade_amount_usd = get_trade_amount_usd()
-    if portfolio_balance < trade_amount_usd:
-        print(f"⚠️  Modo: APENAS VENDAS (saldo < {format_currency(trade_amount_usd)})")
+    # Trading status
+    if cash < trade_amount_usd:
+        lines.append(f"⚠️  Modo: APENAS VENDAS (saldo < {format_currency(trade_amount_usd)})")
     else:
-        remaining_trades = int(portfolio_balance / trade_amount_usd)
-        print(f"✅ Modo: COMPRA E VENDA (trades restantes: {remaining_trades})")
+        lines.append(f"✅ Modo: COMPRA E VENDA (trades restantes: {int(cash / trade_amount_usd)})")
     
     # Holdings
-    if portfolio_holdings:
-        print("\n📈 POSIÇÕES ABERTAS:")
-        holdings_value_usd = 0
-        for currency, holding in portfolio_holdings.items():
-            try:
-                symbol = f"{currency}/USD"
-                ticker = exchange.fetch_ticker(symbol)
-                current_price = ticker['last']
-                holding_value = holding['amount'] * current_price
-                profit_loss = (current_price - holding['avg_price']) * holding['amount']
-                profit_loss_pct = ((current_price - holding['avg_price']) / holding['avg_price']) * 100
-                
-                holdings_value_usd += holding_value
-                
-                status = "🟢" if profit_loss >= 0 else "🔴"
-                print(f"  {status} {currency}: {holding['amount']:.6f} @ {format_currency(holding['avg_price'])} "
-                      f"(atual: {format_currency(current_price)}) | "
-                      f"Valor: {format_currency(holding_value)} | "
-                      f"P&L: {format_currency(profit_loss)} ({profit_loss_pct:+.2f}%)")
-            except:
-                holding_value = holding['amount'] * holding['avg_price']
-                holdings_value_usd += holding_value
-                print(f"  ⚠️  {currency}: {holding['amount']:.6f} @ {format_currency(holding['avg_price'])} "
-                      f"| Valor estimado: {format_currency(holding_value)}")
-        
-        print(f"\n📊 Total em Posições: {format_currency(holdings_value_usd)} | {format_currency(usd_to_brl(holdings_value_usd), 'BRL')}")
+    if summary['positions']:
+        lines.append("\n📈 POSIÇÕES ABERTAS:")
+        for currency, amount, avg_price, mark_price, priced in summary['positions']:
+            holding_value = amount * mark_price
+            if not priced:
+                lines.append(f"  ⚠️  {currency}: {amount:.6f} @ {format_currency(avg_price)} "
+                             f"| Valor estimado: {format_currency(holding_value)}")
+                continue
+            profit_loss = (mark_price - avg_price) * amount
+            profit_loss_pct = ((mark_price - avg_price) / avg_price) * 100
+            status = "🟢" if profit_loss >= 0 else "🔴"
+            lines.append(f"  {status} {currency}: {amount:.6f} @ {format_currency(avg_price)} "
+                         f"(atual: {format_currency(mark_price)}) | "
+                         f"Valor: {format_currency(holding_value)} | "
+                         f"P&L: {format_currency(profit_loss)} ({profit_loss_pct:+.2f}%)")
+        exposure = summary['exposure']
+        lines.append(f"\n📊 Total em Posições: {format_currency(exposure)} | {format_currency(exposure * rate, 'BRL')}")
     else:
-        print("\n📊 Nenhuma posição aberta")
-        holdings_value_usd = 0
+        lines.append("\n📊 Nenhuma posição aberta")
     
     # Total portfolio value
-    total_portfolio_value = portfolio_balance + holdings_value_usd
-    initial_balance_usd = get_initial_balance_usd()
-    current_value_brl = usd_to_brl(total_portfolio_value)
+    total_portfolio_value = summary['equity']
+    initial_balance_usd = summary['initial']
     total_profit_loss = total_portfolio_value - initial_balance_usd
     total_profit_loss_pct = (total_profit_loss / initial_balance_usd) * 100
-    
-    print(f"\n💎 VALOR TOTAL DO PORTFÓLIO:")
-    print(f"   Inicial: {format_currency(initial_balance_usd)} | {format_currency(INITIAL_BALANCE_BRL, 'BRL')}")
-    print(f"   Atual:   {format_currency(total_portfolio_value)} | {format_currency(current_value_brl, 'BRL')}")
-    
     status_emoji = "🟢" if total_profit_loss >= 0 else "🔴"
-    print(f"   {status_emoji} P&L Total: {format_currency(total_profit_loss)} | "
-          f"{format_currency(usd_to_brl(total_profit_loss), 'BRL')} ({total_profit_loss_pct:+.2f}%)")
+    lines += [
+        f"\n💎 VALOR TOTAL DO PORTFÓLIO:",
+        f"   Inicial: {format_currency(initial_balance_usd)} | {format_currency(INITIAL_BALANCE_BRL, 'BRL')}",
+        f"   Atual:   {format_currency(total_portfolio_value)} | {format_currency(total_portfolio_value * rate, 'BRL')}",
+        f"   {status_emoji} P&L Total: {format_currency(total_profit_loss)} | "
+        f"{format_currency(total_profit_loss * rate, 'BRL')} ({total_profit_loss_pct:+.2f}%)",
+        f"   Realizado: {format_currency(summary['realized_pnl'])} | "
+        f"Não realizado: {format_currency(summary['unrealized_pnl'])}",
+    ]
     
     # Trading statistics
-    success_rate = (successful_trades / total_trades * 100) if total_trades > 0 else 0
-    print(f"\n📈 ESTATÍSTICAS DE TRADING:")
-    print(f"   Total de Trades: {total_trades}")
-    print(f"   Trades Bem-sucedidos: {successful_trades}")
-    print(f"   Taxa de Sucesso: {success_rate:.1f}%")
-    
-    print("="*80)
+    total_trades = summary['fills'] + summary['rejected']
+    success_rate = (summary['fills'] / total_trades * 100) if total_trades > 0 else 0
+    lines += [
+        f"\n📈 ESTATÍSTICAS DE TRADING:",
+        f"   Total de Trades: {total_trades}",
+        f"   Trades Bem-sucedidos: {summary['fills']}",
+        f"   Taxa de Sucesso: {success_rate:.1f}%",
+        "="*80,
+    ]
+    return "\n".join(lines)
 
+def render_simulated_sell(sale):
+    """Console text of a simulated_sell event"""
+    profit_emoji = "🟢" if sale['pnl'] >= 0 else "🔴"
+    return (f"[SIMULAÇÃO] ✅ Venda executada: {sale['amount']:.6f} {sale['currency']} "
+            f"por {format_currency(sale['value'])} ({format_currency(sale['value_brl'], 'BRL')}) "
+            f"{profit_emoji} P&L: {format_currency(sale['pnl'])} ({sale['pnl_pct']:+.2f}%)")
+
+event_log.register('portfolio_summary', render_portfolio_summary)
+event_log.register('simulated_sell', render_simulated_sell)
+
+@METRICS.timed('phase_seconds', phase='exchange_init')
 def initialize_exchange():
     """Initialize exchange connection with fallback options"""
     try:
@@ -222,9 +345,12 @@ def initialize_exchange():
                     'enableRateLimit': True,
                     'sandbox': False,
                 })
+                cached = apply_cached_markets(exchange, MARKETS_CACHE_DIR, MARKETS_CACHE_TTL)
                 
                 # Test with balance check
                 balance = exchange.fetch_balance()
+                if not cached:
+                    write_cached_markets(exchange, MARKETS_CACHE_DIR)
                 print(f"[INFO] Coinbase Advanced Trade connected successfully")
                 return exchange
                 
@@ -232,38 +358,24 @@ def initialize_exchange():
                 print(f"[WARNING] Coinbase authentication failed: {auth_error}")
                 print("[INFO] Falling back to public exchange...")
         
-        # Fallback to Binance public API for market data
-        try:
-            print("[INFO] Using Binance as public data source...")
-            exchange = ccxt.binance({
-                'enableRateLimit': True,
-                'options': {
-                    'defaultType': 'spot'
-                }
-            })
-            
-            # Test with public API call
-            ticker = exchange.fetch_ticker('BTC/USDT')
-            print(f"[INFO] Public exchange connected successfully. BTC price: ${ticker['last']:,.2f}")
+        # Public data sources, probed concurrently: the first healthy one in PUBLIC_EXCHANGES order wins
+        print(f"[INFO] Probing public data sources: {', '.join(name for name, _ in PUBLIC_EXCHANGES)}...")
+        candidates = []
+        for exchange_name, probe_symbol in PUBLIC_EXCHANGES:
+            exchange_class = getattr(ccxt, exchange_name, None)
+            if exchange_class is None:
+                continue
+            config = {'enableRateLimit': True}
+            if exchange_name == 'binance':
+                config['options'] = {'defaultType': 'spot'}
+            candidates.append((exchange_name, lambda cls=exchange_class, cfg=config: cls(cfg), probe_symbol))
+        
+        probed = probe_exchanges(candidates, MARKETS_CACHE_DIR, MARKETS_CACHE_TTL)
+        if probed:
+            exchange_name, exchange, ticker = probed
+            print(f"[INFO] Connected to {exchange_name.upper()}. BTC price: ${ticker['last']:,.2f}")
             return exchange
             
-        except Exception as binance_error:
-            print(f"[ERROR] Binance fallback failed: {binance_error}")
-            
-        # Final fallback to any working exchange
-        print("[INFO] Trying alternative exchanges...")
-        fallback_exchanges = ['kraken', 'bitfinex', 'coinbasepro']
-        
-        for exchange_name in fallback_exchanges:
-            try:
-                exchange_class = getattr(ccxt, exchange_name)
-                exchange = exchange_class({'enableRateLimit': True})
-                ticker = exchange.fetch_ticker('BTC/USD')
-                print(f"[INFO] Connected to {exchange_name.upper()}. BTC price: ${ticker['last']:,.2f}")
-                return exchange
-            except:
-                continue
-                
         print("[ERROR] All exchange connections failed")
         return None
         
@@ -271,168 +383,304 @@ def initialize_exchange():
         print(f"[ERROR] Failed to initialize any exchange: {e}")
         return None
 
+def connect_data_sources(exchange):
+    """Warm clients for HEDGED_DATA_SOURCES, candles are then fetched from whichever answers first"""
+    backups = []
+    for exchange_name in HEDGED_DATA_SOURCES:
+        exchange_class = getattr(ccxt, exchange_name, None)
+        if exchange_name == exchange.id or exchange_class is None:
+            continue
+        try:
+            backup = exchange_class({'enableRateLimit': True})
+            load_markets_cached(backup, MARKETS_CACHE_DIR, MARKETS_CACHE_TTL)
+            backups.append((exchange_name, instrument_exchange(backup)))
+        except Exception as e:
+            print(f"[WARNING] Market data source {exchange_name} unavailable: {e}")
+    
+    print(f"[INFO] Hedged market data: {', '.join([exchange.id] + [name for name, _ in backups])} "
+          f"(backup after {HEDGE_DELAY}s)")
+    return HedgedMarketData(exchange, backups, hedge_delay=HEDGE_DELAY, timeout=HEDGE_TIMEOUT)
+
 def get_sma(values, period):
     """Calculate Simple Moving Average for given period"""
     if len(values) < period:
         return None
-    return statistics.mean(values[-period:])
+    return sum(values[-period:]) / period
 
+def process_market_data(symbol, ohlcv):
+    """Feed fetched candles to the SMA engine and return closing prices"""
+    if candle_cache.take_replaced(symbol):
+        # Older candles changed, the incremental state has to be rebuilt
+        sma_engine.reset(symbol)
+        resampler.reset(symbol)
+        if indicator_engine is not None:
+            indicator_engine.reset(symbol)
+    sma_engine.update_candles(symbol, ohlcv)
+    if indicator_engine is not None:
+        indicator_engine.update_candles(symbol, ohlcv)
+    resampler.update_candles(symbol, ohlcv)
+    if ohlcv:
+        price_snapshot.record(symbol, ohlcv[-1][4])
+    if len(ohlcv) < LONG_MA:
+        event_log.warning('insufficient_data', symbol=symbol, need=LONG_MA, got=len(ohlcv))
+        return None
+        
+    # Extract closing prices
+    closes = [candle[4] for candle in ohlcv]  # Index 4 is close price
+    return closes
+
+@METRICS.timed('phase_seconds', phase='fetch')
 def fetch_market_data(exchange, symbol):
     """Fetch OHLCV data for the given symbol"""
     try:
-        # Fetch candlestick data
-        ohlcv = exchange.fetch_ohlcv(symbol, timeframe=TIMEFRAME, limit=LONG_MA + 5)
-        if len(ohlcv) < LONG_MA:
-            print(f"[WARNING] Insufficient data for {symbol} (need {LONG_MA}, got {len(ohlcv)})")
-            return None
-            
-        # Extract closing prices
-        closes = [candle[4] for candle in ohlcv]  # Index 4 is close price
-        return closes
+        # Fetch candlestick data (only new candles after the first call), hedged across venues if enabled
+        ohlcv = candle_cache.get(data_router or exchange, symbol)
+        return process_market_data(symbol, ohlcv)
         
     except Exception as e:
-        print(f"[ERROR] Failed to fetch data for {symbol}: {e}")
+        event_log.error('fetch_failed', symbol=symbol, error=str(e))
         return None
 
-def analyze_market(exchange, symbol):
-    """Analyze market using SMA crossover strategy"""
+@METRICS.timed('phase_seconds', phase='fetch')
+async def fetch_market_data_async(async_exchange, symbol):
+    """Fetch OHLCV data for the given symbol with a ccxt.async_support exchange"""
     try:
-        # Get market data
-        closes = fetch_market_data(exchange, symbol)
-        if not closes:
-            return
-            
-        # Calculate SMAs
-        short_sma = get_sma(closes, SHORT_MA)
-        long_sma = get_sma(closes, LONG_MA)
+        ohlcv = await candle_cache.get_async(async_exchange, symbol)
+        return process_market_data(symbol, ohlcv)
         
-        if short_sma is None or long_sma is None:
-            print(f"[WARNING] Cannot calculate SMAs for {symbol}")
-            return
-            
-        current_price = closes[-1]
+    except Exception as e:
+        event_log.error('fetch_failed', symbol=symbol, error=str(e))
+        return None
+
+def scan_market_async(loop, async_exchange, symbols, limiter):
+    """Fetch market data for all symbols concurrently, returns {symbol: closes}"""
+    worker = lambda symbol: fetch_market_data_async(async_exchange, symbol)
+    return loop.run_until_complete(scan_symbols(symbols, worker, SCAN_CONCURRENCY, limiter))
+
+@METRICS.timed('phase_seconds', phase='indicators')
+def compute_signal(symbol, closes):
+    """SMA crossover signal for symbol, returns None if SMAs are not available yet"""
+    # Calculate SMAs (running sums, updated as candles arrive)
+    short_sma = sma_engine.get_sma(symbol, SHORT_MA)
+    long_sma = sma_engine.get_sma(symbol, LONG_MA)
+    
+    if short_sma is None or long_sma is None:
+        event_log.warning('sma_unavailable', symbol=symbol)
+        return None
         
-        # Determine signal
-        if short_sma > long_sma:
-            signal = "BUY"
-            signal_strength = ((short_sma - long_sma) / long_sma) * 100
-        elif short_sma < long_sma:
-            signal = "SELL"
-            signal_strength = ((long_sma - short_sma) / long_sma) * 100
+    # Determine signal
+    if short_sma > long_sma:
+        signal = "BUY"
+        signal_strength = ((short_sma - long_sma) / long_sma) * 100
+    elif short_sma < long_sma:
+        signal = "SELL"
+        signal_strength = ((long_sma - short_sma) / long_sma) * 100
+    else:
+        signal = "HOLD"
+        signal_strength = 0
+    
+    # Trend on the confirmation timeframes (built locally, no extra requests)
+    confirmations = {}
+    for timeframe in CONFIRM_TIMEFRAMES:
+        timeframe_closes = resampler.closes(symbol, timeframe)
+        timeframe_short = get_sma(timeframe_closes, SHORT_MA)
+        timeframe_long = get_sma(timeframe_closes, LONG_MA)
+        if timeframe_short is None or timeframe_long is None:
+            confirmations[timeframe] = None
+        elif timeframe_short > timeframe_long:
+            confirmations[timeframe] = "BUY"
+        elif timeframe_short < timeframe_long:
+            confirmations[timeframe] = "SELL"
         else:
-            signal = "HOLD"
-            signal_strength = 0
-            
-        # Print analysis with BRL values
-        timestamp = time.strftime('%H:%M:%S')
-        price_brl = usd_to_brl(current_price)
-        print(f"[{timestamp}] {symbol}: Price=${current_price:.2f} (R${price_brl:.2f}) | "
-              f"SMA{SHORT_MA}=${short_sma:.2f} | SMA{LONG_MA}=${long_sma:.2f} | "
-              f"Signal={signal} ({signal_strength:.2f}%)")
+            confirmations[timeframe] = "HOLD"
         
-        # Execute simulated trade in DRY_RUN mode or real trade
-        if signal in ["BUY", "SELL"]:
-            if DRY_RUN:
-                execute_simulated_trade(symbol, signal, current_price)
-            else:
-                execute_trade(exchange, symbol, signal, current_price)
+    return {
+        'symbol': symbol,
+        'signal': signal,
+        'signal_strength': signal_strength,
+        'price': closes[-1],
+        'short_sma': short_sma,
+        'long_sma': long_sma,
+        'confirmations': confirmations,  # {timeframe: "BUY" | "SELL" | "HOLD" | None (not enough history)}
+        'indicators': indicator_engine.values(symbol) if indicator_engine is not None else {},  # {output: value or None}
+    }
+
+def handle_signal(exchange, result):
+    """Log the analysis and act on a signal from compute_signal"""
+    symbol = result['symbol']
+    signal = result['signal']
+    current_price = result['price']
+    
+    # Log analysis with BRL values
+    event_log.info('analysis', symbol=symbol, price=current_price, price_brl=usd_to_brl(current_price),
+                   short_sma=result['short_sma'], long_sma=result['long_sma'], signal=signal,
+                   signal_strength=result['signal_strength'], indicators=result.get('indicators', {}))
+    
+    # Higher timeframes must point the same way
+    unconfirmed = []
+    if signal in ["BUY", "SELL"]:
+        unconfirmed = [tf for tf, trend in result.get('confirmations', {}).items() if trend != signal]
+    
+    # Only act when the SMAs actually cross; an unconfirmed crossover stays pending
+    if EDGE_TRIGGERED_SIGNALS:
+        signal = signal_state.update(symbol, signal, result['signal_strength'], confirmed=not unconfirmed)
+        if signal is not None and not unconfirmed:
+            event_log.info('crossover', symbol=symbol, signal=signal)
+    
+    if signal in ["BUY", "SELL"] and unconfirmed:
+        event_log.info('unconfirmed', symbol=symbol, signal=signal, timeframes=', '.join(unconfirmed))
+        return
+    
+    # Execute simulated trade in DRY_RUN mode or real trade
+    if signal in ["BUY", "SELL"]:
+        if coordinator_client is not None:
+            coordinator_client.publish({'symbol': symbol, 'signal': signal, 'price': current_price})
+        if DRY_RUN:
+            execute_simulated_trade(symbol, signal, current_price)
+        else:
+            execute_trade(exchange, symbol, signal, current_price)
+
+def last_closed_ts(symbol):
+    """Open time of the newest closed candle cached for symbol (the last one is still forming)"""
+    candles = candle_cache.candles.get(symbol) or []
+    return candles[-2][0] if len(candles) >= 2 else None
+
+def scan_symbol(exchange, symbol):
+    """Fetch data and compute the signal without trading (runs inside scanner shards)"""
+    closes = fetch_market_data(exchange, symbol)
+    if not closes:
+        return None
+    result = compute_signal(symbol, closes)
+    if result is not None:
+        result['closed_ts'] = last_closed_ts(symbol)
+    return result
+
+def analyze_market(exchange, symbol, closes=None):
+    """Analyze market using SMA crossover strategy"""
+    try:
+        # Get market data (unless it was already fetched by the async scan)
+        if closes is None:
+            closes = fetch_market_data(exchange, symbol)
+        if not closes:
+            return
+            
+        result = compute_signal(symbol, closes)
+        if result is not None:
+            handle_signal(exchange, result)
             
     except Exception as e:
-        print(f"[ERROR] Error analyzing {symbol}: {e}")
+        event_log.error('analyze_failed', symbol=symbol, error=str(e))
 
+@METRICS.timed('phase_seconds', phase='order_submit')
 def execute_simulated_trade(symbol, signal, current_price):
     """Execute simulated trade for DRY_RUN mode with sequential trading logic"""
-    global portfolio_balance, total_trades, successful_trades
-    
     try:
         base_currency = symbol.split('/')[0]
         
         if signal == "BUY":
-            # Only buy if we don't already have this position AND have sufficient balance
-            if base_currency in portfolio_holdings:
-                # Skip buy if we already have this asset
-                return
-                
             trade_amount_usd = get_trade_amount_usd()
             
-            # Check if we have sufficient balance for this trade
-            if portfolio_balance < trade_amount_usd:
+            # Only buy if we don't already have this position AND have sufficient balance. Both are
+            # checked while holding the cash, so instances sharing the portfolio can't buy it twice
+            reservation = ledger.reserve(trade_amount_usd, currency=base_currency)
+            if reservation is None:
                 # Don't print warning for insufficient balance anymore - just skip
                 return
             
-            amount = trade_amount_usd / current_price
-            if update_portfolio(symbol, "BUY", amount, current_price):
-                amount_brl = usd_to_brl(trade_amount_usd)
-                print(f"[SIMULAÇÃO] ✅ Compra executada: {amount:.6f} {base_currency} "
-                      f"por {format_currency(trade_amount_usd)} ({format_currency(amount_brl, 'BRL')})")
-                total_trades += 1
-                successful_trades += 1
+            try:
+                amount = trade_amount_usd / current_price
+                bought = update_portfolio(symbol, "BUY", amount, current_price, reservation)
+            finally:
+                ledger.release(reservation)  # no-op once the buy used it
+            if bought:
+                event_log.info('simulated_buy', symbol=symbol, currency=base_currency, amount=amount,
+                               price=current_price, value=trade_amount_usd, value_brl=usd_to_brl(trade_amount_usd))
                 
         elif signal == "SELL":
             # Only sell if we have this position
-            if base_currency not in portfolio_holdings:
+            if not ledger.holds(base_currency):
                 return  # Don't print message for positions we don't have
                 
             # Sell the entire position when signal is triggered
-            available_amount = portfolio_holdings[base_currency]['amount']
+            available_amount, avg_buy_price, _ = ledger.position(base_currency)
             
             if available_amount > 0 and update_portfolio(symbol, "SELL", available_amount, current_price):
                 sell_value_usd = available_amount * current_price
-                sell_value_brl = usd_to_brl(sell_value_usd)
                 
                 # Calculate profit/loss
-                avg_buy_price = portfolio_holdings[base_currency]['avg_price'] if base_currency in portfolio_holdings else current_price
                 profit_loss = (current_price - avg_buy_price) * available_amount
                 profit_loss_pct = ((current_price - avg_buy_price) / avg_buy_price) * 100 if avg_buy_price > 0 else 0
-                profit_emoji = "🟢" if profit_loss >= 0 else "🔴"
                 
-                print(f"[SIMULAÇÃO] ✅ Venda executada: {available_amount:.6f} {base_currency} "
-                      f"por {format_currency(sell_value_usd)} ({format_currency(sell_value_brl, 'BRL')}) "
-                      f"{profit_emoji} P&L: {format_currency(profit_loss)} ({profit_loss_pct:+.2f}%)")
-                total_trades += 1
-                successful_trades += 1
+                event_log.info('simulated_sell', symbol=symbol, currency=base_currency, amount=available_amount,
+                               price=current_price, value=sell_value_usd, value_brl=usd_to_brl(sell_value_usd),
+                               pnl=profit_loss, pnl_pct=profit_loss_pct)
                 
     except Exception as e:
-        print(f"[ERROR] Erro na simulação de trade para {symbol}: {e}")
+        event_log.error('simulated_trade_failed', symbol=symbol, error=str(e))
 
+@METRICS.timed('phase_seconds', phase='order_submit')
 def execute_trade(exchange, symbol, signal, current_price):
-    """Execute actual trade orders (only when DRY_RUN is False)"""
+    """Queue actual trade orders (only when DRY_RUN is False), analysis does not wait for them"""
     try:
+        base_currency = symbol.split('/')[0]
+        
         if signal == "BUY":
             # Calculate amount to buy
             trade_amount_usd = get_trade_amount_usd()
             amount = trade_amount_usd / current_price
-            print(f"[TRADE] Executing BUY order for {amount:.8f} {symbol.split('/')[0]} (${trade_amount_usd})")
-            
-            # Create market buy order
-            order = exchange.create_market_buy_order(symbol, amount)
-            print(f"[SUCCESS] Buy order executed: {order['id']}")
+            side = 'buy'
+            event_log.info('buy_queued', symbol=symbol, currency=base_currency, amount=amount, value=trade_amount_usd)
             
         elif signal == "SELL":
-            # For sell orders, you would need to track your holdings
-            # This is a simplified example
-            trade_amount_usd = get_trade_amount_usd()
-            amount = trade_amount_usd / current_price
-            print(f"[TRADE] Executing SELL order for {amount:.8f} {symbol.split('/')[0]}")
+            # Sell the tracked position when we have one (filled orders are reconciled into it)
+            if ledger.holds(base_currency):
+                amount = ledger.position(base_currency)[0]
+            else:
+                trade_amount_usd = get_trade_amount_usd()
+                amount = trade_amount_usd / current_price
+            side = 'sell'
+            event_log.info('sell_queued', symbol=symbol, currency=base_currency, amount=amount)
+        else:
+            return
             
-            # Create market sell order
-            order = exchange.create_market_sell_order(symbol, amount)
-            print(f"[SUCCESS] Sell order executed: {order['id']}")
+        if order_executor.submit(symbol, side, amount) is None:
+            event_log.info('order_in_flight', symbol=symbol, side=side.upper())
             
     except Exception as e:
-        print(f"[ERROR] Failed to execute {signal} order for {symbol}: {e}")
+        event_log.error('order_failed', symbol=symbol, signal=signal, error=str(e))
 
+def apply_order_fills():
+    """Reconcile fills reported by the order executor into the portfolio ledger"""
+    if order_executor is None:
+        return
+    for fill in order_executor.drain_fills():
+        action = "BUY" if fill['side'] == 'buy' else "SELL"
+        fields = {'symbol': fill['symbol'], 'action': action, 'amount': fill['amount'],
+                  'price': fill['price'], 'client_order_id': fill['client_order_id']}
+        try:
+            applied = update_portfolio(fill['symbol'], action, fill['amount'], fill['price'])
+        except Exception as e:
+            # One bad fill must not stop the bot
+            event_log.error('fill_failed', error=str(e), **fields)
+            continue
+        if applied:
+            event_log.info('fill', **fields)
+        else:
+            event_log.warning('fill_mismatch', **fields)
+
+@METRICS.timed('phase_seconds', phase='market_load')
 def get_available_symbols(exchange):
     """Get all available USD/USDT trading pairs"""
     try:
-        markets = exchange.load_markets()
+        # Usually already set from the disk cache while probing the exchange
+        markets = load_markets_cached(exchange, MARKETS_CACHE_DIR, MARKETS_CACHE_TTL)
         
-        # First try USD pairs, then USDT as fallback
+        # First try USD pairs, then USDT as fallback (also when the filters leave no USD pair)
         quote_currencies = ['USD', 'USDT']
-        active_symbols = []
         
         for quote in quote_currencies:
             symbols = [symbol for symbol in markets.keys() if symbol.endswith(f'/{quote}')]
+            active_symbols = []
             
             for symbol in symbols:
                 market_info = markets[symbol]
@@ -441,7 +689,11 @@ def get_available_symbols(exchange):
             
             if active_symbols:
                 print(f"[INFO] Found {len(active_symbols)} active {quote} trading pairs")
-                return active_symbols[:15]  # Limit to 15 pairs for performance
+                active_symbols = filter_symbols(exchange, active_symbols, MIN_QUOTE_VOLUME_USD, MAX_SPREAD_PCT)
+                if MIN_QUOTE_VOLUME_USD or MAX_SPREAD_PCT is not None:
+                    print(f"[INFO] {len(active_symbols)} pairs left after volume/spread filters")
+                if active_symbols:
+                    return active_symbols[:MAX_SYMBOLS]
         
         return []
         
@@ -465,6 +717,45 @@ def get_available_symbols(exchange):
         
         return fallback_symbols
 
+async def run_streaming(exchange, symbols):
+    """Event-driven loop: run the SMA crossover as soon as the feed updates a symbol"""
+    # Seed history once over REST, the stream only carries the newest candle
+    for symbol in symbols:
+        fetch_market_data(exchange, symbol)
+    
+    symbols_by_id = {}
+    for symbol in symbols:
+        try:
+            market_id = exchange.market(symbol)['id']
+        except Exception:
+            market_id = symbol.replace('/', '')
+        symbols_by_id[market_id.upper()] = symbol
+    
+    url = STREAM_URL or binance_stream_url(symbols_by_id.keys(), TIMEFRAME)
+    state = {'cycle': 0, 'last_summary': time.time()}
+    
+    def on_candle(market_id, candle, closed):
+        symbol = symbols_by_id.get(market_id.upper())
+        if symbol is None:
+            return
+        
+        apply_order_fills()
+        closes = process_market_data(symbol, candle_cache.apply(symbol, candle, exchange.id))
+        if closes and (closed or STREAM_EVAL_ON_TICK):
+            analyze_market(exchange, symbol, closes)
+            signal_state.save()
+        
+        # Keep the periodic summary of the polling mode
+        if time.time() - state['last_summary'] >= CHECK_INTERVAL:
+            state['cycle'] += 1
+            state['last_summary'] = time.time()
+            fx_rates.begin_cycle()
+            if DRY_RUN:
+                print_portfolio_summary(exchange, state['cycle'])
+    
+    event_log.info('streaming', symbols=len(symbols_by_id), timeframe=TIMEFRAME)
+    await run_stream(url, CandleBuilder(TIMEFRAME, on_candle))
+
 def print_startup_info():
     """Print startup information and configuration"""
     print("=" * 60)
@@ -487,66 +778,269 @@ def print_startup_info():
         
     print("=" * 60)
 
+def local_ledger():
+    """The portfolio journaled by this process, recovered from the journal on creation"""
+    return PortfolioLedger(PORTFOLIO_JOURNAL_FILE, PORTFOLIO_SNAPSHOT_EVERY, fsync=PORTFOLIO_FSYNC)
+
+def start_cassette():
+    """Set up recording or replay; a replay runs dry, offline and on a virtual clock"""
+    global cassette, candle_cache, fx_rates, signal_state, ledger, DRY_RUN, MAX_CYCLES, ASYNC_SCAN, SHARD_COUNT, STREAMING_MODE
+    
+    # Sessions are sequential and self-contained: no disk candle history, no extra clients
+    if ASYNC_SCAN or SHARD_COUNT or STREAMING_MODE:
+        print("[INFO] Cassette mode scans sequentially (ASYNC_SCAN, SHARD_COUNT and STREAMING_MODE ignored)")
+    ASYNC_SCAN = STREAMING_MODE = False
+    SHARD_COUNT = 0
+    candle_cache = CandleCache(TIMEFRAME, OHLCV_CACHE_SIZE)
+    
+    if CASSETTE_MODE == 'record':
+        cassette = CassetteRecorder(CASSETTE_FILE)
+        if ledger is None:
+            ledger = local_ledger()
+        cassette.record_state(fx_rates, signal_state, ledger)
+        print(f"[INFO] Recording session to {CASSETTE_FILE}")
+    elif CASSETTE_MODE == 'replay':
+        cassette = CassettePlayer(CASSETTE_FILE)
+        cassette.install_clock([__name__, 'candle_cache', 'fx_rates', 'scheduler', 'market_cache', 'event_log'])
+        fx_rates = FxRateProvider(ttl=FX_RATE_TTL, cache_file=None, fallback_rate=FX_FALLBACK_RATE,
+                                  retry_delay=FX_RETRY_DELAY)
+        signal_state = SignalStateMachine(None, threshold_pct=SIGNAL_THRESHOLD_PCT)
+        ledger = PortfolioLedger(None)  # replayed trades never touch the real journal
+        cassette.restore_state(fx_rates, signal_state, ledger)
+        DRY_RUN = True
+        recorded_cycles = max(cassette.cycles, default=0)
+        MAX_CYCLES = min(MAX_CYCLES, recorded_cycles) if MAX_CYCLES else recorded_cycles
+        print(f"[INFO] Replaying {recorded_cycles} cycles from {CASSETTE_FILE}")
+    else:
+        print(f"[ERROR] Unknown CASSETTE_MODE {CASSETTE_MODE!r}, expected 'record' or 'replay'")
+        sys.exit(1)
+
+def start_coordination():
+    """Serve the portfolio to the other instances, or trade through the instance that already does"""
+    global coordinator, coordinator_client, ledger, signal_state
+    
+    if CASSETTE_MODE:
+        print("[INFO] Cassette sessions keep their own portfolio (COORDINATOR_SOCKET ignored)")
+        return
+    
+    # Instances scan different symbols, each keeps its own crossover state
+    if INSTANCE_COUNT > 1 and SIGNAL_STATE_FILE:
+        signal_state = SignalStateMachine(f"{SIGNAL_STATE_FILE}.{INSTANCE_INDEX}", threshold_pct=SIGNAL_THRESHOLD_PCT)
+    
+    lock_file = claim_coordinator(COORDINATOR_SOCKET)
+    if lock_file is not None:
+        # Only the coordinator recovers and writes the journal
+        ledger = local_ledger()
+        coordinator = PortfolioCoordinator(ledger, COORDINATOR_SOCKET, lock_file)
+        print(f"[INFO] Portfolio coordinator listening on {COORDINATOR_SOCKET}")
+        return
+    
+    try:
+        coordinator_client = connect_worker(COORDINATOR_SOCKET, f"instance-{INSTANCE_INDEX}")
+    except OSError as e:
+        print(f"[FATAL] Portfolio coordinator at {COORDINATOR_SOCKET} is not answering: {e}")
+        sys.exit(1)
+    ledger = RemoteLedger(coordinator_client)
+    print(f"[INFO] Trading through the portfolio coordinator at {COORDINATOR_SOCKET}")
+
 def main():
     """Main trading bot loop"""
-    global portfolio_balance
+    global order_executor, data_router, ledger
+    
+    if INSTANCE_COUNT > 1 and not COORDINATOR_SOCKET:
+        # Separate ledgers on one journal would spend the same cash twice
+        print("[FATAL] INSTANCE_COUNT > 1 needs a COORDINATOR_SOCKET to share the portfolio")
+        sys.exit(1)
+    if CASSETTE_MODE:
+        start_cassette()
+    if COORDINATOR_SOCKET:
+        start_coordination()
+    if ledger is None:
+        ledger = local_ledger()
     
-    # Initialize portfolio balance with the USD equivalent
-    portfolio_balance = get_initial_balance_usd()
+    # Fresh portfolios start with the USD equivalent, a recovered one keeps its journaled cash
+    ledger.open(get_initial_balance_usd())
     
     print_startup_info()
     
+    if METRICS_PORT:
+        try:
+            start_http_server(METRICS, METRICS_HOST, METRICS_PORT)
+        except OSError as e:
+            print(f"[WARNING] Metrics endpoint disabled: {e}")
+    
     # Initialize exchange
-    exchange = initialize_exchange()
+    exchange = cassette.exchange if CASSETTE_MODE == 'replay' else initialize_exchange()
     if not exchange:
         print("[FATAL] Cannot proceed without exchange connection")
         return
+    if CASSETTE_MODE == 'record':
+        cassette.record_exchange(exchange)
+    instrument_exchange(exchange)
         
     # Get available trading symbols
     symbols = get_available_symbols(exchange)
+    if INSTANCE_COUNT > 1:
+        symbols = instance_symbols(symbols, INSTANCE_INDEX, INSTANCE_COUNT)
     if not symbols:
         print("[FATAL] No trading symbols available")
         return
+    if CASSETTE_MODE == 'record':
+        cassette.record_markets(exchange)
         
     print(f"[INFO] Monitoring {len(symbols)} USD pairs...")
     print(f"[INFO] Symbols: {', '.join(symbols[:10])}{'...' if len(symbols) > 10 else ''}")
     print("-" * 60)
     
-    # Main trading loop
+    # Orders are placed on a background thread so a slow exchange never stalls the scan
+    if not DRY_RUN:
+        order_executor = OrderExecutor(exchange, max_retries=ORDER_MAX_RETRIES,
+                                       base_delay=ORDER_RETRY_BASE_DELAY, max_delay=ORDER_RETRY_MAX_DELAY,
+                                       id_prefix=ORDER_ID_PREFIX)
+    
+    # Scanner worker processes, signals come back to this process which owns the portfolio
+    shard_pool = None
+    if SHARD_COUNT > 0 and not STREAMING_MODE:
+        shard_pool = ShardPool(exchange, symbols, scan_symbol, SHARD_COUNT, SHARD_RATE_LIMIT_MS, SHARD_JITTER)
+    
+    # Async client and shared rate limiter for concurrent scanning
+    async_loop = async_exchange = limiter = None
+    if ASYNC_SCAN:
+        async_loop = asyncio.new_event_loop()
+        async_exchange = instrument_exchange(create_async_exchange(exchange))
+        limiter = TokenBucket.from_rate_limit(exchange.rateLimit, burst=SCAN_CONCURRENCY)
+        print(f"[INFO] Async scan enabled: {SCAN_CONCURRENCY} concurrent requests, "
+              f"{1000 / exchange.rateLimit:.1f} req/s")
+    
+    # Hedged candle fetches for the sequential scan (shards and the async scan use their own clients)
+    if HEDGED_DATA_SOURCES and shard_pool is None and not ASYNC_SCAN and not STREAMING_MODE:
+        data_router = connect_data_sources(exchange)
+    
+    # Candle-aligned scheduling: first pass evaluates everything, then only new closes
+    scheduler = None
+    wake_kind = CLOSE
+    if ALIGN_TO_CANDLES:
+        scheduler = CandleScheduler(TIMEFRAME, close_delay=CANDLE_CLOSE_DELAY, jitter=SCHEDULER_JITTER,
+                                    intra_interval=INTRA_CANDLE_INTERVAL, retry_delay=NEW_CANDLE_RETRY_DELAY)
+    
+    # Main trading loop, from here on everything is logged through the event log's writer thread
+    event_log.synchronous = False
     cycle_count = 0
     try:
+        if STREAMING_MODE:
+            asyncio.run(run_streaming(exchange, symbols))
+            return
+        
         while True:
             cycle_count += 1
-            print(f"\n[CYCLE {cycle_count}] Starting market analysis...")
+            event_log.info('cycle_start', cycle=cycle_count)
             
-            # Analyze each symbol
-            for i, symbol in enumerate(symbols, 1):
-                try:
-                    analyze_market(exchange, symbol)
-                    
-                    # Add small delay between API calls to respect rate limits
-                    if i < len(symbols):
-                        time.sleep(1)
-                        
-                except Exception as e:
-                    print(f"[ERROR] Failed to analyze {symbol}: {e}")
-                    continue
+            METRICS.begin_cycle()
+            if cassette is not None:
+                cassette.mark_cycle(cycle_count)
+            
+            # One USD/BRL rate and one set of prices for the whole cycle
+            fx_rates.begin_cycle()
+            price_snapshot.begin_cycle()
+            apply_order_fills()
+            
+            # With the scheduler, skip symbols whose last closed candle did not change
+            targets = scheduler.targets(wake_kind, symbols) if scheduler else symbols
+            
+            if shard_pool is not None:
+                # Shards scan in parallel, trades are applied here against the single portfolio
+                shard_targets = targets if targets is not symbols else None
+                for result in shard_pool.run_cycle(cycle_count, timeout=CHECK_INTERVAL, targets=shard_targets):
+                    try:
+                        if result['price']:
+                            price_snapshot.record(result['symbol'], result['price'])
+                        if scheduler is None or scheduler.should_evaluate(wake_kind, result['symbol'], result['closed_ts']):
+                            handle_signal(exchange, result)
+                    except Exception as e:
+                        event_log.error('signal_failed', symbol=result['symbol'], error=str(e))
+            elif ASYNC_SCAN:
+                # Fetch everything concurrently, then analyze from memory
+                market_data = scan_market_async(async_loop, async_exchange, targets, limiter)
+                if indicator_engine is not None:
+                    indicator_engine.compute()  # one vectorized pass for every fetched symbol
+                for symbol in targets:
+                    closes = market_data.get(symbol)
+                    if closes and (scheduler is None or scheduler.should_evaluate(wake_kind, symbol, last_closed_ts(symbol))):
+                        analyze_market(exchange, symbol, closes)
+            else:
+                # Analyze each symbol (ccxt's enableRateLimit spaces the requests); with indicators,
+                # fetch every symbol first so they get one vectorized pass, then analyze
+                market_data = {}
+                for symbol in targets:
+                    try:
+                        closes = fetch_market_data(exchange, symbol)
+                        if closes and (scheduler is None or scheduler.should_evaluate(wake_kind, symbol, last_closed_ts(symbol))):
+                            if indicator_engine is not None:
+                                market_data[symbol] = closes
+                            else:
+                                analyze_market(exchange, symbol, closes)
+                            
+                    except Exception as e:
+                        event_log.error('analyze_failed', symbol=symbol, error=str(e))
+                        continue
+                if indicator_engine is not None:
+                    indicator_engine.compute()
+                    for symbol, closes in market_data.items():
+                        try:
+                            analyze_market(exchange, symbol, closes)
+                        except Exception as e:
+                            event_log.error('analyze_failed', symbol=symbol, error=str(e))
                     
-            print(f"[CYCLE {cycle_count}] Analysis complete.")
+            event_log.info('cycle_complete', cycle=cycle_count, symbols=len(targets))
+            if data_router is not None:
+                event_log.info('data_sources', status=' | '.join(data_router.status()))
+            if coordinator is not None:
+                for worker, worker_signal in coordinator.drain_signals():
+                    event_log.info('worker_signal', worker=worker, **worker_signal)
+            signal_state.save()
             
             # Print portfolio summary at the end of each cycle
             if DRY_RUN:
                 print_portfolio_summary(exchange, cycle_count)
             
-            print(f"Waiting {CHECK_INTERVAL} seconds...")
-            time.sleep(CHECK_INTERVAL)
+            record = METRICS.end_cycle(cycle_count, METRICS_CYCLE_LOG)
+            METRICS.observe('cycle_seconds', record['duration'])
+            
+            if MAX_CYCLES and cycle_count >= MAX_CYCLES:
+                event_log.info('max_cycles', max_cycles=MAX_CYCLES)
+                break
+            
+            if scheduler is not None:
+                event_log.info('waiting_candle', timeframe=TIMEFRAME)
+                wake_kind = scheduler.wait()
+            else:
+                event_log.info('waiting', seconds=CHECK_INTERVAL)
+                time.sleep(CHECK_INTERVAL)
             
     except KeyboardInterrupt:
-        print("\n[INFO] Trading bot stopped by user (Ctrl+C)")
+        event_log.info('stopped')
     except Exception as e:
-        print(f"\n[FATAL] Unexpected error in main loop: {e}")
+        event_log.error('fatal', error=str(e))
     finally:
-        print("[INFO] Trading bot shutting down...")
+        signal_state.save()
+        if order_executor is not None:
+            event_log.info('draining_orders')
+            order_executor.close()
+            apply_order_fills()
+        if coordinator is not None:
+            coordinator.close()
+        ledger.close()
+        if shard_pool is not None:
+            shard_pool.close()
+        if async_exchange is not None:
+            async_loop.run_until_complete(async_exchange.close())
+            async_loop.close()
+        if cassette is not None:
+            cassette.close()
+        if data_router is not None:
+            data_router.close()
+        event_log.info('shutdown')
+        event_log.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,106 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from event_log import EVENTS
+
+
+EVENTS.register_formats({
+    'markets_cache_unreadable': "[WARNING] Ignoring unreadable markets cache {file}: {error}",
+    'markets_cache_write_failed': "[WARNING] Failed to cache markets for {exchange}: {error}",
+    'probe_failed': "[WARNING] {exchange} probe failed: {error}",
+})
+
+
+def _cache_path(cache_dir, exchange_id):
+    return os.path.join(cache_dir, f"{exchange_id}.json")
+
+
+def read_cached_markets(exchange_id, cache_dir, ttl):
+    """Return markets cached on disk for exchange_id, or None if missing or older than ttl"""
+    path = _cache_path(cache_dir, exchange_id)
+    try:
+        with open(path) as f:
+            data = json.load(f)
+        if time.time() - data['fetched_at'] > ttl:
+            return None
+        return data['markets']
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        EVENTS.warning('markets_cache_unreadable', file=path, error=str(e))
+        return None
+
+
+def write_cached_markets(exchange, cache_dir):
+    """Save the exchange's loaded markets to disk"""
+    if not exchange.markets:
+        return
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        path = _cache_path(cache_dir, exchange.id)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'fetched_at': time.time(), 'markets': exchange.markets}, f)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        EVENTS.warning('markets_cache_write_failed', exchange=exchange.id, error=str(e))
+
+
+def apply_cached_markets(exchange, cache_dir, ttl):
+    """Give the exchange its cached markets so ccxt skips load_markets(); returns True on a cache hit"""
+    markets = read_cached_markets(exchange.id, cache_dir, ttl)
+    if markets is None:
+        return False
+    exchange.set_markets(markets)
+    return True
+
+
+def load_markets_cached(exchange, cache_dir, ttl):
+    """Drop-in for exchange.load_markets() backed by a disk cache with a TTL"""
+    if exchange.markets:
+        return exchange.markets
+    if apply_cached_markets(exchange, cache_dir, ttl):
+        return exchange.markets
+    markets = exchange.load_markets()
+    write_cached_markets(exchange, cache_dir)
+    return markets
+
+
+def probe_exchange(create_exchange, probe_symbol, cache_dir, ttl):
+    """Create an exchange client and check it answers; returns (exchange, ticker)"""
+    exchange = create_exchange()
+    cache_hit = apply_cached_markets(exchange, cache_dir, ttl)
+    # With cached markets this is a single request, otherwise ccxt loads markets first
+    ticker = exchange.fetch_ticker(probe_symbol)
+    if not cache_hit:
+        write_cached_markets(exchange, cache_dir)
+    return exchange, ticker
+
+
+def probe_exchanges(candidates, cache_dir, ttl):
+    """Probe every candidate concurrently, the first healthy one in candidates order wins
+
+    candidates: list of (name, create_exchange, probe_symbol), most preferred first.
+    Returns (name, exchange, ticker) or None if every probe failed. The choice
+    only depends on which probes succeed, not on which answers first, so the
+    venue (and its symbol universe) is the same from run to run.
+    """
+    if not candidates:
+        return None
+
+    pool = ThreadPoolExecutor(max_workers=len(candidates), thread_name_prefix='exchange-probe')
+    futures = [(name, pool.submit(probe_exchange, create, symbol, cache_dir, ttl))
+               for name, create, symbol in candidates]
+    try:
+        for name, future in futures:
+            try:
+                exchange, ticker = future.result()
+                return name, exchange, ticker
+            except Exception as e:
+                EVENTS.warning('probe_failed', exchange=name, error=str(e))
+        return None
+    finally:
+        # Less preferred probes are abandoned, their clients are simply dropped
+        pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,173 @@
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from metrics import METRICS
+from event_log import EVENTS
+
+EVENTS.register_formats({
+    'data_source_benched': "[WARNING] Market data source {source} benched for {cooldown:.0f}s after {failures} failures",
+})
+
+
+LATENCY_ALPHA = 0.2        # EWMA weight of the newest latency sample
+ERROR_ALPHA = 0.2          # EWMA weight of the newest success/failure
+DEGRADED_ERROR_RATE = 0.5  # sources above this error rate are only used as a last resort
+MAX_FAILURES = 3           # consecutive failures before a source is benched
+COOLDOWN = 30.0            # seconds a benched source is skipped
+
+
+class DataSource:
+    """One exchange client with its latency and error scores"""
+
+    def __init__(self, name, exchange):
+        self.name = name
+        self.exchange = exchange
+        self.latency = None  # EWMA of successful response times, seconds
+        self.error_rate = 0.0
+        self.failures = 0    # consecutive
+        self.benched_until = 0.0
+        self.wins = 0
+
+    def supports(self, symbol):
+        markets = self.exchange.markets
+        return markets is None or symbol in markets
+
+    def available(self, now):
+        return now >= self.benched_until
+
+    def score(self):
+        """Lower is better: expected latency inflated by the error rate"""
+        latency = self.latency if self.latency is not None else 1.0
+        return latency * (1 + 10 * self.error_rate)
+
+    def record(self, latency=None, error=False):
+        if error:
+            self.error_rate += ERROR_ALPHA * (1 - self.error_rate)
+            self.failures += 1
+            if self.failures >= MAX_FAILURES:
+                self.benched_until = time.monotonic() + COOLDOWN
+                EVENTS.warning('data_source_benched', source=self.name, cooldown=COOLDOWN, failures=self.failures)
+        else:
+            self.error_rate -= ERROR_ALPHA * self.error_rate
+            self.failures = 0
+            self.latency = latency if self.latency is None else self.latency + LATENCY_ALPHA * (latency - self.latency)
+
+
+class HedgedMarketData:
+    """fetch_ohlcv over several warm exchange clients with hedged requests
+
+    The best-scored source that lists the symbol gets the request; if it
+    has not answered after hedge_delay seconds, the next one is asked too,
+    and the first valid response wins. Slow or failing sources sink in the
+    ranking, so a degraded venue stops being asked first. Orders and
+    balances still go to the trading exchange only.
+    """
+
+    def __init__(self, primary, backups, hedge_delay=0.3, timeout=10.0, max_hedges=1):
+        self.sources = [DataSource(primary.id, primary)] + [DataSource(name, exchange) for name, exchange in backups]
+        self.id = primary.id  # candles are stored under the trading venue, only once it has sent them
+        self.answered_by = {}  # {symbol: name of the source whose candles the last fetch_ohlcv returned}
+        self.hedge_delay = hedge_delay
+        self.timeout = timeout
+        self.max_hedges = max_hedges  # backup requests per call
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=4 * len(self.sources), thread_name_prefix='market-data')
+
+    def _ranked(self, symbol):
+        now = time.monotonic()
+        with self._lock:
+            candidates = [source for source in self.sources if source.supports(symbol)]
+            healthy = [source for source in candidates
+                       if source.available(now) and source.error_rate < DEGRADED_ERROR_RATE]
+            rest = [source for source in candidates if source not in healthy]
+            return sorted(healthy, key=DataSource.score) + sorted(rest, key=DataSource.score)
+
+    def _call(self, source, method, args, kwargs):
+        started = time.perf_counter()
+        try:
+            result = getattr(source.exchange, method)(*args, **kwargs)
+        except Exception:
+            with self._lock:
+                source.record(error=True)
+            METRICS.inc('market_data_errors_total', source=source.name)
+            raise
+        latency = time.perf_counter() - started
+        with self._lock:
+            source.record(latency)
+        METRICS.observe('market_data_seconds', latency, source=source.name)
+        return result
+
+    def _hedged(self, symbol, method, *args, **kwargs):
+        candidates = self._ranked(symbol)
+        if not candidates:
+            raise ValueError(f"no market data source lists {symbol}")
+
+        pending = {}  # {future: source}
+        launched = 0
+        last_error = None
+        deadline = time.monotonic() + self.timeout
+
+        def launch():
+            nonlocal launched
+            source = candidates[launched]
+            launched += 1
+            if pending:
+                METRICS.inc('market_data_hedges_total', source=source.name)
+            pending[self._pool.submit(self._call, source, method, args, kwargs)] = source
+
+        launch()
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            can_hedge = launched < len(candidates) and len(pending) <= self.max_hedges
+            done, _ = wait(pending, timeout=min(self.hedge_delay, remaining) if can_hedge else remaining,
+                           return_when=FIRST_COMPLETED)
+            if not done:
+                if can_hedge:
+                    launch()  # too slow, ask the next source as well
+                continue
+
+            for future in done:
+                source = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    last_error = e
+                    continue
+                with self._lock:
+                    source.wins += 1
+                    self.answered_by[symbol] = source.name
+                return result  # slower requests finish in the background and only update scores
+
+            if not pending and launched < len(candidates):
+                launch()  # every request in flight failed, fail over right away
+
+        if last_error is not None and not pending:
+            raise last_error
+        raise TimeoutError(f"{method} {symbol}: no market data source answered within {self.timeout:.0f}s")
+
+    def fetch_ohlcv(self, symbol, timeframe='1h', since=None, limit=None):
+        return self._hedged(symbol, 'fetch_ohlcv', symbol, timeframe=timeframe, since=since, limit=limit)
+
+    def fetch_primary_ohlcv(self, symbol, timeframe='1h', since=None, limit=None):
+        """Future of fetch_ohlcv from the trading venue alone (no hedging), None while it is benched"""
+        source = self.sources[0]
+        with self._lock:
+            if not source.available(time.monotonic()):
+                return None
+        kwargs = dict(timeframe=timeframe, since=since, limit=limit)
+        return self._pool.submit(self._call, source, 'fetch_ohlcv', (symbol,), kwargs)
+
+    def status(self):
+        """One line per source for the logs"""
+        with self._lock:
+            return [
+                f"{source.name}: latency {source.latency * 1000:.0f}ms, errors {source.error_rate:.0%}, wins {source.wins}"
+                if source.latency is not None else f"{source.name}: no data yet (errors {source.error_rate:.0%})"
+                for source in self.sources
+            ]
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,249 @@
+import asyncio
+import functools
+import json
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from event_log import EVENTS
+
+EVENTS.register_formats({
+    'cycle_metrics_write_failed': "[WARNING] Failed to write cycle metrics: {error}",
+    'metrics_listening': "[INFO] Metrics available at http://{host}:{port}/metrics",
+})
+
+PREFIX = 'memedig_'
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+RATE_LIMIT_ERRORS = ('RateLimitExceeded', 'DDoSProtection')
+
+# Exchange methods counted as API calls by instrument_exchange(). load_markets is left out
+# because ccxt calls it before every request and it is usually answered from memory.
+EXCHANGE_METHODS = (
+    'fetch_ohlcv', 'fetch_ticker', 'fetch_tickers', 'fetch_balance',
+    'create_order', 'fetch_order', 'fetch_orders', 'fetch_open_orders', 'fetch_closed_orders',
+)
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram (Prometheus semantics)"""
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count', 'max')
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile"""
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.max
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(label_key, extra=()):
+    pairs = list(label_key) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{value}"' for name, value in pairs) + '}'
+
+
+class Metrics:
+    """Process-wide latency histograms and counters, plus per-cycle totals"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {}  # {(name, label_key): Histogram}
+        self.counters = {}    # {(name, label_key): value}
+        self.cycle_timings = {}   # {(name, label_key): [count, total, max]} since begin_cycle()
+        self.cycle_counters = {}  # {(name, label_key): value} since begin_cycle()
+        self.cycle_started = time.perf_counter()
+
+    def observe(self, name, value, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+            timing = self.cycle_timings.setdefault(key, [0, 0.0, 0.0])
+            timing[0] += 1
+            timing[1] += value
+            timing[2] = max(timing[2], value)
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+            self.cycle_counters[key] = self.cycle_counters.get(key, 0) + value
+
+    @contextmanager
+    def timer(self, name, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def timed(self, name, **labels):
+        """Decorator timing every call of a sync or async function"""
+        def decorator(func):
+            if asyncio.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    with self.timer(name, **labels):
+                        return await func(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(name, **labels):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def begin_cycle(self):
+        """Start collecting a new per-cycle record"""
+        with self._lock:
+            self.cycle_timings = {}
+            self.cycle_counters = {}
+            self.cycle_started = time.perf_counter()
+
+    def end_cycle(self, cycle, path=None):
+        """Build the per-cycle JSON record and append it to `path` (JSON lines) if given"""
+        with self._lock:
+            record = {
+                'cycle': cycle,
+                'timestamp': time.time(),
+                'duration': time.perf_counter() - self.cycle_started,
+                'timings': {
+                    name + _format_labels(label_key): {'count': count, 'total': total, 'max': maximum}
+                    for (name, label_key), (count, total, maximum) in sorted(self.cycle_timings.items())
+                },
+                'counters': {
+                    name + _format_labels(label_key): value
+                    for (name, label_key), value in sorted(self.cycle_counters.items())
+                },
+            }
+        if path:
+            try:
+                with open(path, 'a') as f:
+                    f.write(json.dumps(record) + '\n')
+            except Exception as e:
+                EVENTS.warning('cycle_metrics_write_failed', error=str(e))
+        return record
+
+    def render_prometheus(self):
+        """Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            counter_names = sorted({name for name, _ in self.counters})
+            for metric in counter_names:
+                lines.append(f"# TYPE {PREFIX}{metric} counter")
+                for (name, label_key), value in sorted(self.counters.items()):
+                    if name == metric:
+                        lines.append(f"{PREFIX}{name}{_format_labels(label_key)} {value}")
+
+            histogram_names = sorted({name for name, _ in self.histograms})
+            for metric in histogram_names:
+                lines.append(f"# TYPE {PREFIX}{metric} histogram")
+                for (name, label_key), histogram in sorted(self.histograms.items()):
+                    if name != metric:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f"{PREFIX}{name}_bucket{_format_labels(label_key, [('le', bound)])} {cumulative}")
+                    lines.append(f"{PREFIX}{name}_bucket{_format_labels(label_key, [('le', '+Inf')])} {histogram.count}")
+                    lines.append(f"{PREFIX}{name}_sum{_format_labels(label_key)} {histogram.sum}")
+                    lines.append(f"{PREFIX}{name}_count{_format_labels(label_key)} {histogram.count}")
+        return '\n'.join(lines) + '\n'
+
+
+METRICS = Metrics()
+
+
+def start_http_server(metrics, host='127.0.0.1', port=9108):
+    """Serve /metrics in Prometheus format from a daemon thread"""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] not in ('/', '/metrics'):
+                self.send_error(404)
+                return
+            body = metrics.render_prometheus().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass  # keep scrapes out of the bot output
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    EVENTS.info('metrics_listening', host=host, port=port)
+    return server
+
+
+def _record_call(metrics, method, started, error=None):
+    metrics.observe('api_call_seconds', time.perf_counter() - started, method=method)
+    metrics.inc('api_calls_total', method=method)
+    if error is not None:
+        metrics.inc('api_errors_total', method=method)
+        if type(error).__name__ in RATE_LIMIT_ERRORS:
+            metrics.inc('rate_limit_hits_total', method=method)
+
+
+def instrument_exchange(exchange, metrics=METRICS, methods=EXCHANGE_METHODS):
+    """Wrap a (sync or async) ccxt client's API methods to count calls, errors and latency"""
+    for method in methods:
+        original = getattr(exchange, method, None)
+        if original is None or getattr(original, '_instrumented', False):
+            continue
+
+        if asyncio.iscoroutinefunction(original):
+            async def wrapper(*args, _original=original, _method=method, **kwargs):
+                started = time.perf_counter()
+                try:
+                    result = await _original(*args, **kwargs)
+                except Exception as e:
+                    _record_call(metrics, _method, started, e)
+                    raise
+                _record_call(metrics, _method, started)
+                return result
+        else:
+            def wrapper(*args, _original=original, _method=method, **kwargs):
+                started = time.perf_counter()
+                try:
+                    result = _original(*args, **kwargs)
+                except Exception as e:
+                    _record_call(metrics, _method, started, e)
+                    raise
+                _record_call(metrics, _method, started)
+                return result
+
+        wrapper._instrumented = True
+        setattr(exchange, method, wrapper)
+    return exchange
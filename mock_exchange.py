@@ -0,0 +1,198 @@
+"""Deterministic, offline, ccxt-compatible mock exchange.
+
+Prices are a smooth function of (symbol, timestamp), so every run sees the
+same candles and the SMAs cross regularly. Latency, network errors and
+rate-limit errors can be injected to exercise the bot's error paths.
+"""
+import itertools
+import math
+import random
+import time
+import zlib
+
+import ccxt
+
+from candle_cache import timeframe_to_ms
+
+_real_sleep = time.sleep  # injected latency is real even when a virtual clock is installed
+
+
+class MockExchange:
+    """Implements the subset of the ccxt API the bot uses"""
+
+    id = 'mock'
+
+    def __init__(self, symbol_count=100, quote='USDT', latency=0.0, error_rate=0.0,
+                 rate_limit_rate=0.0, rate_limit_ms=50, seed=0):
+        self.latency = latency                  # seconds added to every request
+        self.error_rate = error_rate            # share of requests failing with NetworkError
+        self.rate_limit_rate = rate_limit_rate  # share of requests failing with RateLimitExceeded
+        self.random = random.Random(seed)
+
+        self.rateLimit = rate_limit_ms
+        self.options = {}
+        self.has = {'fetchOrders': True, 'fetchTickers': True, 'fetchOHLCV': True}
+        self.apiKey = self.secret = self.password = None
+
+        self.symbols = [f"M{i:04d}/{quote}" for i in range(symbol_count)]
+        self.markets = None
+        self.orders = {}
+        self.client_order_ids = set()
+        self.balance = {quote: 1_000_000.0}
+        self.calls = {}  # {method: count}
+        self._order_ids = itertools.count(1)
+
+    # -- request plumbing -------------------------------------------------
+
+    def _request(self, method):
+        self.calls[method] = self.calls.get(method, 0) + 1
+        if self.latency:
+            _real_sleep(self.latency)
+        if self.error_rate and self.random.random() < self.error_rate:
+            raise ccxt.NetworkError(f"mock {method}: injected network error")
+        if self.rate_limit_rate and self.random.random() < self.rate_limit_rate:
+            raise ccxt.RateLimitExceeded(f"mock {method}: injected rate limit")
+
+    def milliseconds(self):
+        return int(time.time() * 1000)
+
+    def _price(self, symbol, ts_ms):
+        """Smooth deterministic price curve per symbol"""
+        seed = zlib.crc32(symbol.encode())
+        base = 1 + seed % 1000
+        hours = ts_ms / 3_600_000
+        phase = (seed >> 10) % 628 / 100
+        return base * (1 + 0.05 * math.sin(hours / 9 + phase) + 0.02 * math.sin(hours / 2.3 + 2 * phase))
+
+    # -- markets ------------------------------------------------------------
+
+    def load_markets(self, reload=False, params={}):
+        if self.markets is None or reload:
+            self._request('load_markets')
+            self.markets = {
+                symbol: {
+                    'id': symbol.replace('/', ''),
+                    'symbol': symbol,
+                    'base': symbol.split('/')[0],
+                    'quote': symbol.split('/')[1],
+                    'active': True,
+                    'type': 'spot',
+                    'spot': True,
+                }
+                for symbol in self.symbols
+            }
+        return self.markets
+
+    def set_markets(self, markets, currencies=None):
+        self.markets = markets
+        return markets
+
+    def market(self, symbol):
+        return self.load_markets()[symbol]
+
+    # -- market data --------------------------------------------------------
+
+    def fetch_ohlcv(self, symbol, timeframe='1h', since=None, limit=None, params={}):
+        self._request('fetch_ohlcv')
+        timeframe_ms = timeframe_to_ms(timeframe)
+        now_ms = self.milliseconds()
+        current = now_ms // timeframe_ms * timeframe_ms
+        limit = limit or 500
+
+        if since is None:
+            start = current - (limit - 1) * timeframe_ms
+        else:
+            start = -(-since // timeframe_ms) * timeframe_ms
+        end = min(current, start + (limit - 1) * timeframe_ms)
+
+        candles = []
+        for ts in range(start, end + 1, timeframe_ms):
+            close_ts = now_ms if ts == current else ts + timeframe_ms
+            open_price = self._price(symbol, ts)
+            close_price = self._price(symbol, close_ts)
+            mid_price = self._price(symbol, (ts + close_ts) // 2)
+            volume = 100 + (zlib.crc32(f"{symbol}{ts}".encode()) % 1000)
+            candles.append([ts, open_price, max(open_price, close_price, mid_price),
+                            min(open_price, close_price, mid_price), close_price, float(volume)])
+        return candles
+
+    def _ticker(self, symbol):
+        last = self._price(symbol, self.milliseconds())
+        return {
+            'symbol': symbol,
+            'timestamp': self.milliseconds(),
+            'last': last,
+            'bid': last * 0.9995,
+            'ask': last * 1.0005,
+            'baseVolume': 1000.0,
+            'quoteVolume': 1000.0 * last,
+        }
+
+    def fetch_ticker(self, symbol, params={}):
+        self._request('fetch_ticker')
+        return self._ticker(symbol)
+
+    def fetch_tickers(self, symbols=None, params={}):
+        self._request('fetch_tickers')
+        symbols = symbols or list(self.load_markets())
+        return {symbol: self._ticker(symbol) for symbol in symbols}
+
+    # -- trading ------------------------------------------------------------
+
+    def fetch_balance(self, params={}):
+        self._request('fetch_balance')
+        return {'free': dict(self.balance), 'total': dict(self.balance)}
+
+    def create_order(self, symbol, type, side, amount, price=None, params={}):
+        self._request('create_order')
+        client_order_id = params.get('clientOrderId')
+        if client_order_id in self.client_order_ids:
+            raise ccxt.DuplicateOrderId(f"mock: duplicate clientOrderId {client_order_id}")
+        if client_order_id:
+            self.client_order_ids.add(client_order_id)
+
+        fill_price = self._price(symbol, self.milliseconds())
+        order = {
+            'id': str(next(self._order_ids)),
+            'clientOrderId': client_order_id,
+            'timestamp': self.milliseconds(),
+            'symbol': symbol,
+            'type': type,
+            'side': side,
+            'amount': amount,
+            'filled': amount,
+            'remaining': 0.0,
+            'average': fill_price,
+            'price': fill_price,
+            'cost': amount * fill_price,
+            'status': 'closed',
+        }
+        self.orders[order['id']] = order
+        return dict(order)
+
+    def create_market_buy_order(self, symbol, amount, params={}):
+        return self.create_order(symbol, 'market', 'buy', amount, params=params)
+
+    def create_market_sell_order(self, symbol, amount, params={}):
+        return self.create_order(symbol, 'market', 'sell', amount, params=params)
+
+    def fetch_order(self, id, symbol=None, params={}):
+        self._request('fetch_order')
+        if id not in self.orders:
+            raise ccxt.OrderNotFound(f"mock: order {id} not found")
+        return dict(self.orders[id])
+
+    def fetch_orders(self, symbol=None, since=None, limit=None, params={}):
+        self._request('fetch_orders')
+        return [dict(order) for order in self.orders.values()
+                if (symbol is None or order['symbol'] == symbol) and (since is None or order['timestamp'] >= since)]
+
+    def fetch_open_orders(self, symbol=None, since=None, limit=None, params={}):
+        self._request('fetch_open_orders')
+        return []
+
+    def fetch_closed_orders(self, symbol=None, since=None, limit=None, params={}):
+        return self.fetch_orders(symbol, since, limit, params)
+
+    def close(self):
+        pass
@@ -0,0 +1,202 @@
+import queue
+import threading
+import time
+import uuid
+
+import ccxt
+
+from event_log import EVENTS
+
+EVENTS.register_formats({
+    'order_error': "[ERROR] Order {client_order_id} for {symbol} failed: {error}",
+    'order_placed': "[SUCCESS] {side} order placed for {symbol}: {order_id} ({client_order_id})",
+    'order_rejected': "[ERROR] {side} order for {symbol} rejected: {error}",
+    'order_gave_up': "[ERROR] {side} order for {symbol} failed after {attempts} attempts: {error}",
+    'order_retry': "[WARNING] {side} order for {symbol} failed ({error}), retrying in {delay:.1f}s...",
+    'order_lookup_failed': "[WARNING] Could not look up order {client_order_id}: {error}",
+    'order_trades_failed': "[WARNING] Could not fetch trades of order {order_id}: {error}",
+    'order_refresh_failed': "[WARNING] Could not refresh order {order_id}: {error}",
+    'order_unfilled': "[WARNING] Order {order_id} for {symbol} has no fills (status: {status})",
+    'fill_without_price': ("[WARNING] Order {order_id} for {symbol} filled {amount} without a price, "
+                           "not applied to the portfolio"),
+})
+
+
+FINAL_STATUSES = ('closed', 'canceled', 'expired', 'rejected')
+
+
+def new_client_order_id(prefix='memedig'):
+    """Unique client order id, reused on every retry of the same order"""
+    return f"{prefix}-{uuid.uuid4().hex[:20]}"
+
+
+class OrderExecutor:
+    """Places market orders on a background thread so analysis never waits on the exchange
+
+    Every order carries a client order id that stays the same across retries,
+    so a retry after a timeout finds the order that already went through
+    instead of placing it twice. Fills are queued and applied to the portfolio
+    by the main thread with drain_fills().
+    """
+
+    def __init__(self, exchange, max_retries=5, base_delay=1.0, max_delay=30.0,
+                 fill_poll_attempts=5, id_prefix='memedig'):
+        self.exchange = exchange
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.fill_poll_attempts = fill_poll_attempts
+        self.id_prefix = id_prefix
+
+        self.orders = queue.Queue()
+        self.fills = queue.Queue()
+        self.in_flight = set()  # {(symbol, side)} submitted but not finished yet
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name='order-executor', daemon=True)
+        self._thread.start()
+
+    def submit(self, symbol, side, amount):
+        """Queue a market order; returns its client order id, or None if one is already in flight"""
+        with self._lock:
+            if (symbol, side) in self.in_flight:
+                return None
+            self.in_flight.add((symbol, side))
+
+        client_order_id = new_client_order_id(self.id_prefix)
+        self.orders.put({
+            'symbol': symbol,
+            'side': side,
+            'amount': amount,
+            'client_order_id': client_order_id,
+            'created_at': int(time.time() * 1000),
+        })
+        return client_order_id
+
+    def drain_fills(self):
+        """Return fills completed since the last call (call from the main thread)"""
+        fills = []
+        while True:
+            try:
+                fills.append(self.fills.get_nowait())
+            except queue.Empty:
+                return fills
+
+    def close(self, timeout=30):
+        """Stop after the queued orders are processed"""
+        self.orders.put(None)
+        self._thread.join(timeout=timeout)
+
+    def _run(self):
+        while True:
+            request = self.orders.get()
+            if request is None:
+                return
+            try:
+                order = self._place(request)
+                if order is not None:
+                    self._reconcile(request, order)
+            except Exception as e:
+                EVENTS.error('order_error', client_order_id=request['client_order_id'], symbol=request['symbol'],
+                             error=str(e))
+            finally:
+                with self._lock:
+                    self.in_flight.discard((request['symbol'], request['side']))
+
+    def _backoff(self, attempt):
+        return min(self.max_delay, self.base_delay * (2 ** attempt))
+
+    def _place(self, request):
+        """Create the order, retrying transient errors with bounded exponential backoff"""
+        symbol, side, client_order_id = request['symbol'], request['side'], request['client_order_id']
+
+        for attempt in range(self.max_retries + 1):
+            if attempt > 0:
+                # The previous attempt may have reached the exchange before failing
+                existing = self._find_existing(request)
+                if existing is not None:
+                    return existing
+            try:
+                order = self.exchange.create_order(symbol, 'market', side, request['amount'],
+                                                   params={'clientOrderId': client_order_id})
+                EVENTS.info('order_placed', side=side.upper(), symbol=symbol, order_id=order.get('id'),
+                            client_order_id=client_order_id)
+                return order
+            except ccxt.DuplicateOrderId:
+                return self._find_existing(request)
+            except (ccxt.InsufficientFunds, ccxt.InvalidOrder) as e:
+                EVENTS.error('order_rejected', side=side.upper(), symbol=symbol, error=str(e))
+                return None
+            except ccxt.NetworkError as e:
+                if attempt == self.max_retries:
+                    EVENTS.error('order_gave_up', side=side.upper(), symbol=symbol, attempts=attempt + 1, error=str(e))
+                    return None
+                delay = self._backoff(attempt)
+                EVENTS.warning('order_retry', side=side.upper(), symbol=symbol, error=str(e), delay=delay)
+                time.sleep(delay)
+        return None
+
+    def _find_existing(self, request):
+        """Look up an order by client order id, None if the exchange never saw it"""
+        symbol, since = request['symbol'], request['created_at'] - 60000
+        fetchers = []
+        if self.exchange.has.get('fetchOrders'):
+            fetchers.append(self.exchange.fetch_orders)
+        else:
+            fetchers += [self.exchange.fetch_open_orders, self.exchange.fetch_closed_orders]
+
+        for fetch in fetchers:
+            try:
+                for order in fetch(symbol, since=since):
+                    if order.get('clientOrderId') == request['client_order_id']:
+                        return order
+            except Exception as e:
+                EVENTS.warning('order_lookup_failed', client_order_id=request['client_order_id'], error=str(e))
+        return None
+
+    def _trade_price(self, request, order):
+        """Average price of the order's own trades, None if the exchange does not report them"""
+        if not self.exchange.has.get('fetchMyTrades'):
+            return None
+        try:
+            trades = [trade for trade in self.exchange.fetch_my_trades(request['symbol'], since=request['created_at'] - 60000)
+                      if trade.get('order') == order.get('id')]
+        except Exception as e:
+            EVENTS.warning('order_trades_failed', order_id=order.get('id'), error=str(e))
+            return None
+        amount = sum(trade.get('amount') or 0 for trade in trades)
+        cost = sum(trade.get('cost') or (trade.get('amount') or 0) * (trade.get('price') or 0) for trade in trades)
+        return cost / amount if amount and cost else None
+
+    def _reconcile(self, request, order):
+        """Wait for the market order to fill and queue the fill for the portfolio"""
+        for attempt in range(self.fill_poll_attempts):
+            status = order.get('status')
+            if status in FINAL_STATUSES or (status is None and order.get('filled')):
+                break
+            time.sleep(self._backoff(attempt))
+            try:
+                order = self.exchange.fetch_order(order['id'], request['symbol'])
+            except Exception as e:
+                EVENTS.warning('order_refresh_failed', order_id=order.get('id'), error=str(e))
+
+        filled = order.get('filled') or 0
+        if filled <= 0:
+            EVENTS.warning('order_unfilled', order_id=order.get('id'), symbol=request['symbol'], status=order.get('status'))
+            return
+
+        price = order.get('average') or order.get('price')
+        if not price and order.get('cost'):
+            price = order['cost'] / filled
+        if not price:
+            price = self._trade_price(request, order)
+        if not price:
+            EVENTS.warning('fill_without_price', order_id=order.get('id'), symbol=request['symbol'], amount=filled)
+            return
+        self.fills.put({
+            'symbol': request['symbol'],
+            'side': request['side'],
+            'amount': filled,
+            'price': price,
+            'order_id': order.get('id'),
+            'client_order_id': request['client_order_id'],
+        })
@@ -0,0 +1,353 @@
+"""Portfolio ledger: cash and positions backed by an append-only fill journal.
+
+Every fill is appended to the journal (one JSON array per line) as it is
+applied. Every `snapshot_every` entries the whole state is written to
+`{journal}.snapshot` and the journal is truncated, so a restart loads the
+snapshot and replays at most that many lines. A crash between the two
+steps is harmless: entries are numbered and the ones the snapshot already
+covers are skipped.
+
+Positions live in slots of parallel arrays (amount, average price, mark
+price) instead of a dict per holding; cash, exposure and P&L totals are
+kept up to date on every fill and mark, so valuing the portfolio does
+not walk the holdings.
+
+Cash for buys that are not filled yet (buys decided in another process)
+can be reserved; reservations count against the free cash of every later
+buy and are released when the fill is applied. A reservation made for a
+currency also refuses while that currency is held or reserved, so
+checking for a position and holding the cash is one step. They are not
+journaled, a restart starts without reservations.
+All public methods are thread-safe, so a coordinator can serve the
+ledger to several worker processes.
+"""
+import json
+import os
+import threading
+import time
+from array import array
+
+from event_log import EVENTS
+
+EVENTS.register_formats({
+    'portfolio_snapshot_unreadable': "[WARNING] Ignoring unreadable portfolio snapshot {file}: {error}",
+    'portfolio_journal_torn': "[WARNING] Dropping a partial entry at the end of {file}",
+    'portfolio_recovered': ("[INFO] Portfolio recovered: {fills} fills, {positions} positions, "
+                            "{replayed} journal entries replayed in {ms:.1f}ms"),
+})
+
+
+OPEN = 'open'      # initial cash
+BUY = 'buy'
+SELL = 'sell'
+REJECT = 'reject'  # a fill that did not match the portfolio, only counted
+
+
+class PortfolioLedger:
+    """Cash, positions and trade counters with crash recovery"""
+
+    def __init__(self, journal_file=None, snapshot_every=500, fsync=True):
+        self.journal_file = journal_file
+        self.snapshot_file = journal_file + '.snapshot' if journal_file else None
+        self.snapshot_every = snapshot_every
+        self.fsync = fsync
+        self._journal = None  # opened on the first write
+        self.unsnapshotted = 0  # journal entries since the last snapshot
+        self.lock = threading.RLock()
+
+        self.slots = {}       # {currency: slot}
+        self.currencies = []  # slot -> currency, None when free
+        self.free = []        # slots of closed positions, reused first
+        self.amount = array('d')
+        self.avg_price = array('d')
+        self.mark_price = array('d')
+
+        self.seq = 0
+        self.initial_cash = None
+        self.cash = 0.0
+        self.realized_pnl = 0.0
+        self.cost_basis = 0.0    # sum of amount * avg_price
+        self.market_value = 0.0  # sum of amount * mark_price (exposure)
+        self.fills = 0
+        self.rejected = 0
+        self.reservations = {}  # {key: (cash held, currency or None)}
+        self.reserved_currencies = {}  # {currency: key}
+        self.reserved = 0.0
+        self._reservation_seq = 0
+
+        self._recover()
+
+    # Aggregates
+
+    @property
+    def exposure(self):
+        return self.market_value
+
+    @property
+    def unrealized_pnl(self):
+        return self.market_value - self.cost_basis
+
+    @property
+    def equity(self):
+        return self.cash + self.market_value
+
+    @property
+    def available_cash(self):
+        """Cash not held by reservations"""
+        return self.cash - self.reserved
+
+    # Positions
+
+    def holds(self, currency):
+        return currency in self.slots
+
+    def position(self, currency):
+        """(amount, avg_price, mark_price) of a held currency, None if not held"""
+        with self.lock:
+            slot = self.slots.get(currency)
+            if slot is None:
+                return None
+            return self.amount[slot], self.avg_price[slot], self.mark_price[slot]
+
+    def positions(self):
+        """[(currency, amount, avg_price, mark_price)] of every open position"""
+        with self.lock:
+            return [(currency, self.amount[slot], self.avg_price[slot], self.mark_price[slot])
+                    for currency, slot in self.slots.items()]
+
+    def _slot(self, currency):
+        slot = self.slots.get(currency)
+        if slot is None:
+            if self.free:
+                slot = self.free.pop()
+                self.currencies[slot] = currency
+            else:
+                slot = len(self.currencies)
+                self.currencies.append(currency)
+                self.amount.append(0.0)
+                self.avg_price.append(0.0)
+                self.mark_price.append(0.0)
+            self.slots[currency] = slot
+        return slot
+
+    def _release(self, slot):
+        del self.slots[self.currencies[slot]]
+        self.currencies[slot] = None
+        self.amount[slot] = self.avg_price[slot] = self.mark_price[slot] = 0.0
+        self.free.append(slot)
+
+    def mark(self, currency, price):
+        """Value a held currency at price (ignored for currencies not held)"""
+        with self.lock:
+            slot = self.slots.get(currency)
+            if slot is None or price is None:
+                return
+            self.market_value += self.amount[slot] * (price - self.mark_price[slot])
+            self.mark_price[slot] = price
+
+    def reserve(self, amount, key=None, currency=None):
+        """Hold cash for a buy that is not filled yet; returns the reservation key,
+        None if the free cash does not cover it or currency is already held or reserved"""
+        with self.lock:
+            if key in self.reservations:
+                return key
+            if amount > self.available_cash:
+                return None
+            if currency is not None and (currency in self.slots or currency in self.reserved_currencies):
+                return None
+            if key is None:
+                self._reservation_seq += 1
+                key = f"r{self._reservation_seq}"
+            self.reservations[key] = (amount, currency)
+            self.reserved += amount
+            if currency is not None:
+                self.reserved_currencies[currency] = key
+            return key
+
+    def release(self, key):
+        """Give back the cash held by a reservation (unknown keys are ignored)"""
+        with self.lock:
+            reservation = self.reservations.pop(key, None)
+            if reservation is not None:
+                amount, currency = reservation
+                self.reserved = self.reserved - amount if self.reservations else 0.0
+                if currency is not None:
+                    del self.reserved_currencies[currency]
+
+    # State changes
+
+    def _apply(self, entry):
+        """Apply one journal entry, returns False if it does not fit the current state"""
+        kind, currency, amount, price = entry[1:5]
+        if kind == OPEN:
+            self.initial_cash = self.cash = amount
+        elif kind == BUY:
+            cost = amount * price
+            if cost > self.cash - self.reserved:
+                return False
+            slot = self._slot(currency)
+            held = self.amount[slot]
+            total = held + amount
+            self.avg_price[slot] = (held * self.avg_price[slot] + cost) / total
+            self.amount[slot] = total
+            self.market_value += total * price - held * self.mark_price[slot]
+            self.mark_price[slot] = price
+            self.cost_basis += cost
+            self.cash -= cost
+            self.fills += 1
+        elif kind == SELL:
+            slot = self.slots.get(currency)
+            if slot is None or self.amount[slot] < amount:
+                return False
+            held, avg_price = self.amount[slot], self.avg_price[slot]
+            remaining = held - amount
+            self.realized_pnl += (price - avg_price) * amount
+            self.cost_basis -= amount * avg_price
+            self.market_value += remaining * price - held * self.mark_price[slot]
+            self.cash += amount * price
+            self.fills += 1
+            if remaining <= 0:
+                self._release(slot)
+            else:
+                self.amount[slot] = remaining
+                self.mark_price[slot] = price
+        elif kind == REJECT:
+            self.rejected += 1
+        self.seq = entry[0]
+        return True
+
+    def _record(self, kind, currency, amount, price):
+        with self.lock:
+            entry = [self.seq + 1, kind, currency, amount, price, time.time()]
+            applied = self._apply(entry)
+            if not applied:
+                entry[1] = REJECT
+                self._apply(entry)
+            self._append(entry)
+            return applied
+
+    def open(self, cash):
+        """Start a fresh portfolio with cash, no-op if one was recovered"""
+        if self.initial_cash is None:
+            self._record(OPEN, None, cash, None)
+
+    def buy(self, currency, amount, price, reservation=None):
+        """Apply a buy fill, False (counted as rejected) if the free cash does not cover it;
+        the reservation made for it is released first"""
+        with self.lock:
+            self.release(reservation)
+            return self._record(BUY, currency, amount, price)
+
+    def sell(self, currency, amount, price):
+        """Apply a sell fill, False (counted as rejected) if the position is smaller"""
+        return self._record(SELL, currency, amount, price)
+
+    # Persistence
+
+    def _append(self, entry):
+        if not self.journal_file:
+            return
+        if self._journal is None:
+            self._journal = open(self.journal_file, 'a')
+        self._journal.write(json.dumps(entry, separators=(',', ':')) + '\n')
+        self._journal.flush()
+        if self.fsync:
+            os.fsync(self._journal.fileno())
+        self.unsnapshotted += 1
+        if self.unsnapshotted >= self.snapshot_every:
+            self.snapshot()
+
+    def state(self):
+        """Everything needed to rebuild the ledger, as plain JSON types (reservations are not kept)"""
+        with self.lock:
+            return {
+                'seq': self.seq, 'initial_cash': self.initial_cash, 'cash': self.cash,
+                'realized_pnl': self.realized_pnl, 'fills': self.fills, 'rejected': self.rejected,
+                'positions': {currency: [amount, avg_price, mark_price]
+                              for currency, amount, avg_price, mark_price in self.positions()},
+            }
+
+    def load_state(self, state):
+        """Replace the ledger contents with a state() dict (called before the ledger is shared)"""
+        self.slots, self.currencies, self.free = {}, [], []
+        self.amount, self.avg_price, self.mark_price = array('d'), array('d'), array('d')
+        self.seq = state['seq']
+        self.initial_cash = state['initial_cash']
+        self.cash = state['cash']
+        self.realized_pnl = state['realized_pnl']
+        self.fills = state['fills']
+        self.rejected = state['rejected']
+        for currency, (amount, avg_price, mark_price) in state['positions'].items():
+            slot = self._slot(currency)
+            self.amount[slot], self.avg_price[slot], self.mark_price[slot] = amount, avg_price, mark_price
+        self._resync()
+
+    def _resync(self):
+        """Recompute the running totals from the positions, dropping accumulated rounding error"""
+        self.cost_basis = sum(self.amount[slot] * self.avg_price[slot] for slot in self.slots.values())
+        self.market_value = sum(self.amount[slot] * self.mark_price[slot] for slot in self.slots.values())
+
+    def snapshot(self):
+        """Write the state atomically and start an empty journal"""
+        if not self.snapshot_file:
+            return
+        with self.lock:
+            self._resync()
+            tmp_file = self.snapshot_file + '.tmp'
+            with open(tmp_file, 'w') as f:
+                json.dump(self.state(), f)
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+            os.replace(tmp_file, self.snapshot_file)
+
+            if self._journal is None:
+                self._journal = open(self.journal_file, 'a')
+            self._journal.truncate(0)
+            self.unsnapshotted = 0
+
+    def _recover(self):
+        """Load the last snapshot, then replay the journal entries written after it"""
+        if not self.journal_file:
+            return
+        started = time.perf_counter()
+        if os.path.exists(self.snapshot_file):
+            try:
+                with open(self.snapshot_file) as f:
+                    self.load_state(json.load(f))
+            except Exception as e:
+                EVENTS.warning('portfolio_snapshot_unreadable', file=self.snapshot_file, error=str(e))
+        if not os.path.exists(self.journal_file):
+            return
+
+        replayed = 0
+        good_bytes = 0
+        with open(self.journal_file, 'rb') as f:
+            for line in f:
+                try:
+                    if not line.endswith(b'\n'):
+                        raise ValueError('unterminated line')
+                    entry = json.loads(line)
+                except ValueError:
+                    break  # torn last write
+                good_bytes += len(line)
+                if entry[0] > self.seq:
+                    self._apply(entry)
+                    replayed += 1
+        if good_bytes < os.path.getsize(self.journal_file):
+            EVENTS.warning('portfolio_journal_torn', file=self.journal_file)
+            with open(self.journal_file, 'r+b') as f:
+                f.truncate(good_bytes)
+        self.unsnapshotted = replayed
+        if self.initial_cash is not None:
+            EVENTS.info('portfolio_recovered', fills=self.fills, positions=len(self.slots), replayed=replayed,
+                        ms=(time.perf_counter() - started) * 1000)
+
+    def close(self):
+        """Snapshot if the journal has entries, so the next start replays nothing"""
+        with self.lock:
+            if self.unsnapshotted:
+                self.snapshot()
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
@@ -0,0 +1,52 @@
+from event_log import EVENTS
+
+EVENTS.register_formats({
+    'tickers_failed': "[WARNING] Failed to fetch tickers for {currencies}: {error}",
+})
+
+
+class PriceSnapshot:
+    """Latest prices seen during one cycle, shared by valuation and P&L code"""
+
+    def __init__(self):
+        self.prices = {}           # {symbol: last price}
+        self.symbols_by_base = {}  # {base currency: symbol its price came from}
+        self.requests = 0          # bulk ticker requests made this cycle
+
+    def begin_cycle(self):
+        """Drop prices from the previous cycle"""
+        self.prices.clear()
+        self.requests = 0
+
+    def record(self, symbol, price):
+        """Store a price already seen elsewhere (e.g. the last close from fetch_market_data)"""
+        self.prices[symbol] = price
+        self.symbols_by_base[symbol.split('/')[0]] = symbol
+
+    def symbol_for(self, currency):
+        """Market symbol used to price a held currency"""
+        return self.symbols_by_base.get(currency, f"{currency}/USD")
+
+    def ensure(self, exchange, currencies):
+        """Fill in missing prices for currencies with one bulk fetch_tickers call"""
+        missing = [self.symbol_for(currency) for currency in currencies
+                   if self.symbol_for(currency) not in self.prices]
+        if not missing:
+            return
+
+        try:
+            self.requests += 1
+            tickers = exchange.fetch_tickers(missing)
+            for symbol, ticker in tickers.items():
+                if ticker.get('last') is not None:
+                    self.record(symbol, ticker['last'])
+        except Exception as e:
+            EVENTS.warning('tickers_failed', currencies=', '.join(missing), error=str(e))
+
+        # Don't ask again this cycle for prices the exchange couldn't give us
+        for symbol in missing:
+            self.prices.setdefault(symbol, None)
+
+    def price_for(self, currency):
+        """Price of a held currency, or None if it was not seen this cycle"""
+        return self.prices.get(self.symbol_for(currency))
@@ -0,0 +1,104 @@
+from candle_cache import timeframe_to_ms
+
+WEEK_OFFSET_MS = 4 * 24 * 60 * 60 * 1000  # exchanges start weeks on Monday, the epoch was a Thursday
+
+
+def _bucket_start(timestamp, timeframe):
+    timeframe_ms = timeframe_to_ms(timeframe)
+    offset = WEEK_OFFSET_MS if timeframe.endswith('w') else 0
+    return timestamp - (timestamp - offset) % timeframe_ms
+
+
+def _merge(aggregate, candle):
+    """Fold a base candle into an aggregate candle, in place"""
+    aggregate[2] = max(aggregate[2], candle[2])
+    aggregate[3] = min(aggregate[3], candle[3])
+    aggregate[4] = candle[4]
+    aggregate[5] += candle[5]
+
+
+class TimeframeResampler:
+    """Higher-timeframe candles built locally from the base timeframe candles
+
+    Closed base candles are folded into the current higher-timeframe bucket
+    once; the forming base candle is merged in on read. A bucket is only
+    emitted if its first base candle was seen, so a history that starts
+    mid-bucket does not produce a candle with the wrong open.
+    """
+
+    def __init__(self, base_timeframe, timeframes, max_candles):
+        base_ms = timeframe_to_ms(base_timeframe)
+        for timeframe in timeframes:
+            if timeframe.endswith('M') or timeframe_to_ms(timeframe) % base_ms:
+                raise ValueError(f"Cannot resample {base_timeframe} candles into {timeframe}")
+        self.base_timeframe = base_timeframe
+        self.timeframes = list(timeframes)
+        self.max_candles = max_candles  # closed candles kept per timeframe, plus the forming one
+        self.last_closed = {}  # {symbol: timestamp of the newest folded base candle}
+        self.forming = {}      # {symbol: the forming base candle}
+        self.closed = {}       # {(symbol, timeframe): closed higher-timeframe candles}
+        self.partial = {}      # {(symbol, timeframe): aggregate of the closed base candles in the current bucket}
+
+    def _fold(self, symbol, candle):
+        for timeframe in self.timeframes:
+            key = (symbol, timeframe)
+            bucket = _bucket_start(candle[0], timeframe)
+            aggregate = self.partial.get(key)
+
+            if aggregate is not None and aggregate[0] != bucket:
+                # A later bucket started, the current one is complete
+                closed = self.closed.setdefault(key, [])
+                closed.append(aggregate)
+                del closed[:-self.max_candles]
+                aggregate = None
+
+            if aggregate is None:
+                if candle[0] != bucket and key not in self.closed:
+                    continue  # history starts mid-bucket, wait for the next one
+                self.closed.setdefault(key, [])
+                self.partial[key] = [bucket] + list(candle[1:6])
+            else:
+                _merge(aggregate, candle)
+
+    def update_candles(self, symbol, candles):
+        """Feed the base OHLCV candles (forming candle last), skipping the ones already folded"""
+        if not candles:
+            return
+        last_closed = self.last_closed.get(symbol)
+        start = len(candles) - 1
+        while start > 0 and (last_closed is None or candles[start - 1][0] > last_closed):
+            start -= 1
+        for candle in candles[start:-1]:
+            self._fold(symbol, candle)
+        if start < len(candles) - 1:
+            self.last_closed[symbol] = candles[-2][0]
+        self.forming[symbol] = candles[-1]
+
+    def reset(self, symbol):
+        """Forget a symbol, e.g. after its history was refetched"""
+        self.last_closed.pop(symbol, None)
+        self.forming.pop(symbol, None)
+        for timeframe in self.timeframes:
+            self.closed.pop((symbol, timeframe), None)
+            self.partial.pop((symbol, timeframe), None)
+
+    def get(self, symbol, timeframe):
+        """Higher-timeframe candles for symbol, the last one still forming"""
+        key = (symbol, timeframe)
+        candles = list(self.closed.get(key, []))
+        aggregate = self.partial.get(key)
+        forming = self.forming.get(symbol)
+        bucket = _bucket_start(forming[0], timeframe) if forming else None
+
+        if aggregate is not None:
+            aggregate = list(aggregate)
+            if aggregate[0] == bucket:
+                _merge(aggregate, forming)
+            candles.append(aggregate)
+        if forming and bucket != (aggregate[0] if aggregate else None) and (aggregate or forming[0] == bucket):
+            # The forming base candle opened a new bucket
+            candles.append([bucket] + list(forming[1:6]))
+        return candles[-(self.max_candles + 1):]
+
+    def closes(self, symbol, timeframe):
+        return [candle[4] for candle in self.get(symbol, timeframe)]
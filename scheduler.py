@@ -0,0 +1,82 @@
+import random
+import time
+from candle_cache import timeframe_to_ms
+
+CLOSE = 'close'  # woke just after a candle boundary
+RETRY = 'retry'  # re-fetching symbols whose new candle was not published yet
+INTRA = 'intra'  # optional mid-candle evaluation
+
+
+class CandleScheduler:
+    """Wakes the bot just after each candle close instead of on a fixed interval
+
+    After a close, only symbols whose last closed candle changed are
+    evaluated. Symbols the exchange has not published the new candle for
+    yet are retried a few times. An optional intra-candle cadence
+    re-evaluates every symbol on the forming candle in between.
+    """
+
+    def __init__(self, timeframe, close_delay=2.0, jitter=0.0, intra_interval=None,
+                 retry_delay=5.0, max_retries=3, clock=None, sleep=None):
+        self.timeframe_ms = timeframe_to_ms(timeframe)
+        self.close_delay = close_delay        # seconds after the boundary before fetching
+        self.jitter = jitter                  # random extra delay, spreads load between instances
+        self.intra_interval = intra_interval  # seconds between intra-candle passes (None = off)
+        self.retry_delay = retry_delay
+        self.max_retries = max_retries
+        self.clock = clock or time.time
+        self.sleep = sleep or time.sleep
+
+        self.last_closed = {}  # {symbol: timestamp of the last evaluated closed candle}
+        self.expected_closed_ts = None  # open time of the candle that closed at the last boundary
+        self.pending = {}  # {symbol: None}, ordered set of symbols still missing the expected closed candle
+        self.retries = 0
+        self.last_intra = self.clock()
+
+    def _next_boundary(self, now):
+        now_ms = int(now * 1000)
+        return (now_ms // self.timeframe_ms + 1) * self.timeframe_ms / 1000
+
+    def wait(self):
+        """Sleep until the next thing worth doing and return its kind (CLOSE, RETRY or INTRA)"""
+        now = self.clock()
+        boundary = self._next_boundary(now)
+        wake_at, kind = boundary + self.close_delay + random.uniform(0, self.jitter), CLOSE
+
+        if self.pending and self.retries < self.max_retries and now + self.retry_delay < wake_at:
+            wake_at, kind = now + self.retry_delay, RETRY
+        elif self.intra_interval and self.last_intra + self.intra_interval < wake_at:
+            wake_at, kind = max(now, self.last_intra + self.intra_interval), INTRA
+
+        if wake_at > now:
+            self.sleep(wake_at - now)
+
+        if kind == CLOSE:
+            self.expected_closed_ts = int(boundary * 1000) - self.timeframe_ms
+            self.pending = {}
+            self.retries = 0
+        elif kind == RETRY:
+            self.retries += 1
+        else:
+            self.last_intra = self.clock()
+        return kind
+
+    def targets(self, kind, symbols):
+        """Symbols to fetch in this pass"""
+        if kind == RETRY:
+            return list(self.pending)
+        return symbols
+
+    def should_evaluate(self, kind, symbol, closed_ts):
+        """True if symbol has a newly closed candle (always True in an INTRA pass)"""
+        if kind != INTRA and self.expected_closed_ts is not None and (
+                closed_ts is None or closed_ts < self.expected_closed_ts):
+            # New candle not published yet, try again shortly
+            self.pending[symbol] = None
+            return False
+
+        self.pending.pop(symbol, None)
+
+        changed = closed_ts != self.last_closed.get(symbol)
+        self.last_closed[symbol] = closed_ts
+        return changed or kind == INTRA
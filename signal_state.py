@@ -0,0 +1,81 @@
+import json
+import os
+
+from event_log import EVENTS
+
+EVENTS.register_formats({
+    'signal_state_unreadable': "[WARNING] Ignoring unreadable signal state {file}: {error}",
+    'signal_state_write_failed': "[WARNING] Failed to persist signal state: {error}",
+})
+
+
+ABOVE = 'above'  # short SMA above long SMA
+BELOW = 'below'
+
+
+class SignalStateMachine:
+    """Tracks the SMA relationship per symbol and only emits BUY/SELL when the SMAs cross
+
+    A relationship change smaller than threshold_pct (signal strength in %)
+    is treated as noise, which adds hysteresis around the crossover point.
+    States are persisted so a restart does not re-fire on an old trend.
+    """
+
+    def __init__(self, state_file=None, threshold_pct=0.0, fire_on_first=False):
+        self.state_file = state_file
+        self.threshold_pct = threshold_pct
+        self.fire_on_first = fire_on_first  # act on a symbol's first observation too
+        self.states = {}  # {symbol: ABOVE | BELOW}
+        self.dirty = False
+        self._load()
+
+    def _load(self):
+        if not self.state_file or not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file) as f:
+                self.states = json.load(f)
+        except Exception as e:
+            EVENTS.warning('signal_state_unreadable', file=self.state_file, error=str(e))
+
+    def save(self):
+        """Persist states if anything changed since the last save"""
+        if not self.state_file or not self.dirty:
+            return
+        try:
+            tmp_file = self.state_file + '.tmp'
+            with open(tmp_file, 'w') as f:
+                json.dump(self.states, f)
+            os.replace(tmp_file, self.state_file)
+            self.dirty = False
+        except Exception as e:
+            EVENTS.warning('signal_state_write_failed', error=str(e))
+
+    def update(self, symbol, signal, signal_strength, confirmed=True):
+        """Feed the level signal from analyze_market, returns "BUY"/"SELL" on a crossover or None
+
+        A crossover fed with confirmed=False is returned but not recorded, so it
+        stays pending and fires once confirmed, unless the SMAs cross back first.
+        """
+        if signal == "BUY":
+            relation = ABOVE
+        elif signal == "SELL":
+            relation = BELOW
+        else:
+            return None
+
+        previous = self.states.get(symbol)
+        if previous == relation:
+            return None
+        if previous is not None and signal_strength < self.threshold_pct:
+            # Crossed, but not by enough to count
+            return None
+
+        if previous is None and not self.fire_on_first:
+            self.states[symbol] = relation
+            self.dirty = True
+            return None
+        if confirmed:
+            self.states[symbol] = relation
+            self.dirty = True
+        return signal
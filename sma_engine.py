@@ -0,0 +1,79 @@
+import math
+from collections import deque
+
+RESYNC_EVERY = 1000  # Recompute running sums from scratch to cancel float drift
+
+
+class RollingSMA:
+    """Incremental Simple Moving Averages per (symbol, period)"""
+
+    def __init__(self, periods):
+        self.periods = tuple(sorted(set(periods)))
+        self.windows = {}  # {(symbol, period): deque of closes}
+        self.sums = {}     # {(symbol, period): running sum of the window}
+        self.last_ts = {}  # {symbol: timestamp of the newest (forming) candle}
+        self.updates = {}  # {symbol: updates since the last resync}
+
+    def _resync(self, symbol):
+        for period in self.periods:
+            key = (symbol, period)
+            self.sums[key] = math.fsum(self.windows[key])
+        self.updates[symbol] = 0
+
+    def update(self, symbol, timestamp, close):
+        """Feed one candle close; a repeated timestamp replaces the forming candle"""
+        last_ts = self.last_ts.get(symbol)
+
+        if last_ts is None:
+            for period in self.periods:
+                self.windows[(symbol, period)] = deque(maxlen=period)
+                self.sums[(symbol, period)] = 0.0
+            self.updates[symbol] = 0
+
+        if last_ts is not None and timestamp == last_ts:
+            # Forming candle moved
+            for period in self.periods:
+                key = (symbol, period)
+                window = self.windows[key]
+                self.sums[key] += close - window[-1]
+                window[-1] = close
+        elif last_ts is None or timestamp > last_ts:
+            # Previous candle closed, a new one started
+            for period in self.periods:
+                key = (symbol, period)
+                window = self.windows[key]
+                if len(window) == period:
+                    self.sums[key] -= window[0]
+                window.append(close)
+                self.sums[key] += close
+            self.last_ts[symbol] = timestamp
+        else:
+            # Older than what we already have
+            return
+
+        self.updates[symbol] += 1
+        if self.updates[symbol] >= RESYNC_EVERY:
+            self._resync(symbol)
+
+    def update_candles(self, symbol, candles):
+        """Feed OHLCV candles, skipping the ones that were already applied"""
+        last_ts = self.last_ts.get(symbol)
+        for candle in candles:
+            if last_ts is None or candle[0] >= last_ts:
+                self.update(symbol, candle[0], candle[4])
+
+    def get_sma(self, symbol, period):
+        """Return the SMA for symbol, or None if there are not enough candles yet"""
+        key = (symbol, period)
+        window = self.windows.get(key)
+        if window is None or len(window) < period:
+            return None
+        return self.sums[key] / period
+
+    def reset(self, symbol):
+        """Forget a symbol, e.g. after its history was refetched"""
+        self.last_ts.pop(symbol, None)
+        self.updates.pop(symbol, None)
+        for period in self.periods:
+            self.windows.pop((symbol, period), None)
+            self.sums.pop((symbol, period), None)
@@ -0,0 +1,91 @@
+import asyncio
+import json
+from candle_cache import timeframe_to_ms
+from event_log import EVENTS
+
+EVENTS.register_formats({
+    'stream_connected': "[INFO] Stream connected: {url}",
+    'stream_message_failed': "[ERROR] Failed to process stream message: {error}",
+    'stream_disconnected': "[WARNING] Stream disconnected: {error}. Reconnecting in {delay}s...",
+})
+
+
+BINANCE_STREAM_URL = 'wss://stream.binance.com:9443/stream?streams='
+
+
+def binance_stream_url(market_ids, timeframe, base_url=BINANCE_STREAM_URL):
+    """Combined kline stream URL for the given exchange market ids (e.g. 'BTCUSDT')"""
+    streams = '/'.join(f"{market_id.lower()}@kline_{timeframe}" for market_id in market_ids)
+    return base_url + streams
+
+
+class CandleBuilder:
+    """Builds OHLCV candles in memory from kline and trade messages"""
+
+    def __init__(self, timeframe, on_candle):
+        self.timeframe_ms = timeframe_to_ms(timeframe)
+        self.on_candle = on_candle  # on_candle(market_id, candle, closed)
+        self.forming = {}  # {market_id: [timestamp, open, high, low, close, volume]}
+
+    def on_kline(self, market_id, kline):
+        """Apply a Binance-style kline payload"""
+        candle = [int(kline['t']), float(kline['o']), float(kline['h']),
+                  float(kline['l']), float(kline['c']), float(kline['v'])]
+        closed = bool(kline.get('x'))
+        if closed:
+            self.forming.pop(market_id, None)
+        else:
+            self.forming[market_id] = candle
+        self.on_candle(market_id, candle, closed)
+
+    def on_trade(self, market_id, timestamp, price, amount):
+        """Fold a single trade into the forming candle, closing it at the timeframe boundary"""
+        bucket = timestamp // self.timeframe_ms * self.timeframe_ms
+        candle = self.forming.get(market_id)
+
+        if candle is not None and bucket > candle[0]:
+            self.on_candle(market_id, candle, True)
+            candle = None
+
+        if candle is None:
+            candle = [bucket, price, price, price, price, 0.0]
+            self.forming[market_id] = candle
+
+        candle[2] = max(candle[2], price)
+        candle[3] = min(candle[3], price)
+        candle[4] = price
+        candle[5] += amount
+        self.on_candle(market_id, list(candle), False)
+
+    def on_message(self, raw):
+        """Dispatch one raw websocket message (plain or combined-stream wrapped)"""
+        message = json.loads(raw)
+        data = message.get('data', message)
+        event = data.get('e')
+
+        if event == 'kline':
+            self.on_kline(data['s'], data['k'])
+        elif event == 'trade':
+            self.on_trade(data['s'], int(data['T']), float(data['p']), float(data['q']))
+
+
+async def run_stream(url, builder, reconnect_delay=5, stop_event=None):
+    """Consume a websocket feed forever, reconnecting when the connection drops"""
+    import websockets
+
+    while stop_event is None or not stop_event.is_set():
+        try:
+            async with websockets.connect(url, ping_interval=20) as websocket:
+                EVENTS.info('stream_connected', url=url[:80] + ('...' if len(url) > 80 else ''))
+                async for raw in websocket:
+                    try:
+                        builder.on_message(raw)
+                    except Exception as e:
+                        EVENTS.error('stream_message_failed', error=str(e))
+                    if stop_event is not None and stop_event.is_set():
+                        return
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            EVENTS.warning('stream_disconnected', error=str(e), delay=reconnect_delay)
+            await asyncio.sleep(reconnect_delay)
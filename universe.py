@@ -0,0 +1,174 @@
+import multiprocessing
+import queue
+import time
+import zlib
+
+from event_log import EVENTS
+
+
+EVENTS.register_formats({
+    'universe_tickers_failed': "[WARNING] Failed to fetch tickers for universe filters: {error}",
+    'shard_scan_failed': "[ERROR] Shard {shard} failed to scan {symbol}: {error}",
+    'shards_started': "[INFO] Started {shards} scanner shards ({sizes} symbols, {rate_limit_ms}ms rate limit each)",
+    'shards_late': "[WARNING] Shards {pending} did not finish cycle {cycle} in time",
+    'shard_died': "[ERROR] Shard {shard} died",
+})
+
+
+def filter_symbols(exchange, symbols, min_quote_volume=0, max_spread_pct=None):
+    """Keep symbols with enough 24h quote volume and a tight enough spread
+
+    Uses a single bulk fetch_tickers call; if it fails the list is returned unfiltered.
+    """
+    if not min_quote_volume and max_spread_pct is None:
+        return symbols
+
+    try:
+        tickers = exchange.fetch_tickers(symbols)
+    except Exception as e:
+        EVENTS.warning('universe_tickers_failed', error=str(e))
+        return symbols
+
+    selected = []
+    for symbol in symbols:
+        ticker = tickers.get(symbol)
+        if not ticker:
+            continue
+
+        quote_volume = ticker.get('quoteVolume')
+        if quote_volume is None and ticker.get('baseVolume') and ticker.get('last'):
+            quote_volume = ticker['baseVolume'] * ticker['last']
+        if min_quote_volume and (quote_volume or 0) < min_quote_volume:
+            continue
+
+        if max_spread_pct is not None:
+            bid, ask = ticker.get('bid'), ticker.get('ask')
+            if not bid or not ask or (ask - bid) / ask * 100 > max_spread_pct:
+                continue
+
+        selected.append(symbol)
+    return selected
+
+
+def shard_symbols(symbols, shard_count):
+    """Split symbols round-robin into shard_count lists"""
+    return [symbols[i::shard_count] for i in range(shard_count)]
+
+
+def shard_worker(shard_index, exchange_id, exchange_config, markets, symbols, scan_fn, commands, results,
+                 start_delay=0.0):
+    """Worker process: scan its shard with its own exchange client every time the coordinator asks"""
+    import ccxt
+
+    exchange = getattr(ccxt, exchange_id)(exchange_config)
+    if markets:
+        exchange.set_markets(markets)
+
+    while True:
+        command = commands.get()
+        if command is None:
+            break
+        cycle, targets = command
+
+        # Stagger shards so they don't all hit the exchange at the same instant
+        if start_delay:
+            time.sleep(start_delay)
+
+        for symbol in symbols:
+            if targets is not None and symbol not in targets:
+                continue
+            try:
+                result = scan_fn(exchange, symbol)
+                if result is not None:
+                    results.put(('signal', shard_index, cycle, result))
+            except Exception as e:
+                EVENTS.error('shard_scan_failed', shard=shard_index, symbol=symbol, error=str(e))
+        results.put(('done', shard_index, cycle, None))
+
+
+class ShardPool:
+    """Runs market scanning in worker processes and merges their signals for one coordinator"""
+
+    def __init__(self, exchange, symbols, scan_fn, shard_count, rate_limit_ms=None, shard_jitter=0.0):
+        self.shards = [shard for shard in shard_symbols(symbols, shard_count) if shard]
+        self.results = multiprocessing.Queue()
+        self.commands = []
+        self.processes = []
+
+        # The exchange limit is usually per IP, so split it evenly between shards by default
+        if rate_limit_ms is None:
+            rate_limit_ms = exchange.rateLimit * len(self.shards)
+        exchange_config = {
+            'enableRateLimit': True,
+            'rateLimit': rate_limit_ms,
+            'options': dict(exchange.options),
+        }
+
+        for shard_index, shard in enumerate(self.shards):
+            commands = multiprocessing.Queue()
+            process = multiprocessing.Process(
+                target=shard_worker,
+                args=(shard_index, exchange.id, exchange_config, exchange.markets, shard,
+                      scan_fn, commands, self.results, shard_index * shard_jitter),
+                name=f"shard-{shard_index}",
+                daemon=True,
+            )
+            process.start()
+            self.commands.append(commands)
+            self.processes.append(process)
+
+        EVENTS.info('shards_started', shards=len(self.processes), sizes=', '.join(str(len(shard)) for shard in self.shards),
+                    rate_limit_ms=rate_limit_ms)
+
+    def run_cycle(self, cycle, timeout, targets=None):
+        """Ask every shard to scan once (only `targets` if given) and return the signals they produced"""
+        targets = set(targets) if targets is not None else None
+        for commands in self.commands:
+            commands.put((cycle, targets))
+
+        signals = []
+        pending = set(range(len(self.processes)))
+        deadline = time.monotonic() + timeout
+
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                EVENTS.warning('shards_late', pending=sorted(pending), cycle=cycle)
+                break
+            try:
+                kind, shard_index, result_cycle, payload = self.results.get(timeout=min(remaining, 1.0))
+            except queue.Empty:
+                kind = None
+
+            # Results from a cycle that already timed out are dropped
+            if kind is not None and result_cycle == cycle:
+                if kind == 'signal':
+                    signals.append(payload)
+                elif kind == 'done':
+                    pending.discard(shard_index)
+
+            for index in list(pending):
+                if not self.processes[index].is_alive():
+                    EVENTS.error('shard_died', shard=index)
+                    pending.discard(index)
+
+        return signals
+
+    def close(self):
+        """Stop all worker processes"""
+        for commands in self.commands:
+            commands.put(None)
+        for process in self.processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+
+
+def instance_symbols(symbols, instance_index, instance_count):
+    """Symbols scanned by one of instance_count bot instances
+
+    Split by base currency (stable hash), so every pair of a currency is
+    traded by the same instance and each position has a single owner.
+    """
+    return [symbol for symbol in symbols
+            if zlib.crc32(symbol.split('/')[0].encode()) % instance_count == instance_index]
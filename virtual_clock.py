@@ -0,0 +1,42 @@
+import time as real_time
+
+
+class VirtualClock:
+    """Stand-in for the `time` module: sleep() advances the clock instantly instead of blocking"""
+
+    def __init__(self, start=None):
+        self.now = real_time.time() if start is None else start
+        self.slept = 0.0
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            self.now += seconds
+            self.slept += seconds
+
+    def localtime(self, seconds=None):
+        return real_time.localtime(self.now if seconds is None else seconds)
+
+    def strftime(self, fmt, t=None):
+        return real_time.strftime(fmt, self.localtime() if t is None else t)
+
+    def __getattr__(self, name):
+        # perf_counter, struct_time, ... come from the real module
+        return getattr(real_time, name)
+
+
+def install(clock, modules):
+    """Point each module's `time` global at clock; returns a function restoring the originals"""
+    originals = [(module, module.time) for module in modules]
+    for module in modules:
+        module.time = clock
+
+    def restore():
+        for module, original in originals:
+            module.time = original
+    return restore